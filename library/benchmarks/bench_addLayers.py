@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Compare adding layers one at a time with adding them in one batch.
+
+Run from the `library` directory:
+
+    PYTHONPATH=. python3 benchmarks/bench_addLayers.py
+"""
+from timeit import timeit
+
+from rpi_inky_layout import Layout
+
+SIZE = (4000, 122)
+
+
+def incremental(count):
+    layout = Layout(SIZE, border=1)
+    [layout.addLayer() for i in range(count)]
+    return layout
+
+
+def deferred(count):
+    layout = Layout(SIZE, border=1)
+    with layout.deferResize():
+        [layout.addLayer() for i in range(count)]
+    return layout
+
+
+def main():
+    print("{:>8} {:>14} {:>14} {:>9}".format(
+        "children", "incremental/s", "deferred/s", "speedup"))
+    for count in (10, 100, 1000):
+        number = max(1, 1000 // count)
+        tInc = timeit(lambda: incremental(count), number=number) / number
+        tDef = timeit(lambda: deferred(count), number=number) / number
+        print("{:>8} {:>14.6f} {:>14.6f} {:>8.1f}x".format(
+            count, tInc, tDef, tInc / tDef))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Benchmarks for building, resizing, drawing and writing Layout trees.
+
+Run from the `library` directory:
+
+    PYTHONPATH=. python3 benchmarks/bench_suite.py
+
+Each scenario builds a representative tree and records the best time, over
+several repeats, for:
+
+* construct: building the tree with the public API.
+* resize: re-running `_resizeChildren` over the whole tree.
+* draw: drawing the whole tree from scratch.
+* redraw: drawing again after one leaf changes.
+* write: writing the top-level image to a PNG file.
+
+and the peak memory allocated while building, drawing and writing it once.
+
+Compare against a stored baseline, failing if anything got slower than the
+threshold allows:
+
+    PYTHONPATH=. python3 benchmarks/bench_suite.py \\
+        --baseline benchmarks/baseline.json --update-baseline  # first time
+    PYTHONPATH=. python3 benchmarks/bench_suite.py \\
+        --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy
+import PIL
+from PIL import Image, ImageDraw
+
+from rpi_inky_layout import Layout, Rotation
+
+METRICS = ('construct', 'resize', 'draw', 'redraw', 'write')
+
+
+class LayoutSub(Layout):
+    """The drawOverride pattern from test_issue_43."""
+
+    def __init__(self):
+        super().__init__((200, 200))
+
+    def drawOverride(self):
+        self._image = Image.new("P", self.size, 0)
+        self._image.putpalette(Layout.DEFAULT_PALETTE)
+        draw = ImageDraw.Draw(self._image)
+        draw.text((self.size[0] // 4, self.size[1] // 2), "LayoutSub", 1)
+
+
+def setImage(layout, colour=(255, 255, 255)):
+    layout.setImage(Image.new("RGB", layout.size, colour))
+
+
+def wide():
+    layout = Layout((4000, 122), border=1)
+    layout.addLayers([{}] * 1000)
+    [setImage(child) for child in layout.children]
+    return layout
+
+
+def deep():
+    layout = Layout((250, 122), border=1)
+    level = layout
+    for depth in range(20):
+        level = level.addLayer(border=1, packingMode='hv'[depth % 2])
+    setImage(level)
+    return layout
+
+
+def mixedBias():
+    layout = Layout((400, 300), packingMode='v', border=1)
+    for row in range(4):
+        rowLayout = layout.addLayer(border=1, packingBias=row % 2 + 1)
+        for column in range(6):
+            setImage(rowLayout.addLayer(packingBias=column % 4 + 1))
+    return layout
+
+
+def rotated(rotation):
+    def build():
+        layout = Layout(
+            (250, 122), packingMode='v', border=1, rotation=rotation)
+        [setImage(layout.addLayer(border=1)) for i in range(3)]
+        return layout
+    return build
+
+
+def drawOverride():
+    layout = Layout((400, 200), border=1)
+    layout.addLayout(LayoutSub())
+    right = layout.addLayer(packingMode='v')
+    [right.addLayout(LayoutSub()) for i in range(4)]
+    return layout
+
+
+SCENARIOS = {
+    'wide': wide,
+    'deep': deep,
+    'mixedBias': mixedBias,
+    'rotationUP': rotated(Rotation.UP),
+    'rotationRIGHT': rotated(Rotation.RIGHT),
+    'rotationDOWN': rotated(Rotation.DOWN),
+    'rotationLEFT': rotated(Rotation.LEFT),
+    'drawOverride': drawOverride,
+}
+
+
+def leaves(layout):
+    if not layout.children:
+        return [layout]
+    return sum([leaves(child) for child in layout.children], [])
+
+
+def resizeAll(layout):
+    layout._resizeChildren()
+
+
+def drawAll(layout):
+    layout.markDirty()
+    [leaf.markDirty() for leaf in leaves(layout)]
+    layout.draw()
+
+
+def redrawOne(layout):
+    leaves(layout)[-1].markDirty()
+    layout.draw()
+
+
+def best(function, repeat, number=1):
+    return min(timeit.repeat(function, repeat=repeat, number=number)) / number
+
+
+def peakMemory(build, fp):
+    tracemalloc.start()
+    try:
+        layout = build()
+        layout.draw()
+        layout.write(fp, depths=())
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def runScenario(build, repeat, directory):
+    fp = os.path.join(directory, "bench.png")
+    layout = build()
+    layout.draw()
+    return {
+        'construct': best(build, repeat),
+        'resize': best(lambda: resizeAll(layout), repeat),
+        'draw': best(lambda: drawAll(layout), repeat),
+        'redraw': best(lambda: redrawOne(layout), repeat),
+        'write': best(lambda: layout.write(fp, depths=()), repeat),
+        'peakMemory': peakMemory(build, fp),
+    }
+
+
+def run(names, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            results[name] = runScenario(SCENARIOS[name], repeat, directory)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'numpy': numpy.__version__,
+            'pillow': PIL.__version__,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """List the (scenario, metric, baseline, result) that regressed."""
+    regressions = []
+    for name, metrics in results['results'].items():
+        base = baseline['results'].get(name, {})
+        for metric, value in metrics.items():
+            if metric in base and value > base[metric] * (1 + threshold):
+                regressions.append((name, metric, base[metric], value))
+    return regressions
+
+
+def printResults(results):
+    print("{:<14}".format("scenario") + "".join(
+        ["{:>12}".format(m) for m in METRICS]) + "{:>12}".format("peak KiB"))
+    for name, metrics in results['results'].items():
+        print("{:<14}".format(name) + "".join(
+            ["{:>12.6f}".format(metrics[m]) for m in METRICS]
+        ) + "{:>12.0f}".format(metrics['peakMemory'] / 1024))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'scenarios', nargs='*', default=list(SCENARIOS),
+        help="scenarios to run (default: all of {s})".format(
+            s=", ".join(SCENARIOS)))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare with this results file")
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help="the allowed slow-down, as a fraction (default: 0.2)")
+    parser.add_argument(
+        '--update-baseline', action='store_true',
+        help="write the results to the baseline file instead of comparing")
+    args = parser.parse_args(argv)
+
+    results = run(args.scenarios, args.repeat)
+    printResults(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("Baseline written to {b}".format(b=args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline at {b}: record one with --update-baseline".format(
+            b=args.baseline), file=sys.stderr)
+        return 2
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for name, metric, base, value in regressions:
+        print("REGRESSION: {n} {m}: {b:.6g} -> {v:.6g}".format(
+            n=name, m=metric, b=base, v=value))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
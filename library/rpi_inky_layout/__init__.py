@@ -1,5 +1,16 @@
-__name__ = 'rpi_inky_layout'
-from .layout import Layout  # noqa: F401
-from .rotation import Rotation  # noqa: F401
-from .position import Position  # noqa: F401
-from .index_order import IndexOrder  # noqa: F401
+__name__ = 'rpi_inky_layout'
+__version__ = '0.3.0'
+from .layout import Layout  # noqa: F401
+from .rotation import Rotation  # noqa: F401
+from .position import Position  # noqa: F401
+from .index_order import IndexOrder  # noqa: F401
+from .damage import Damage  # noqa: F401
+from .render_stats import RenderStats  # noqa: F401
+from .spec import LayoutSpec  # noqa: F401
+from .geometry_cache import GeometryCache  # noqa: F401
+from .scheduler import RefreshScheduler  # noqa: F401
+from .frame_pipeline import FramePipeline, Frame  # noqa: F401
+from .frame_writer import FrameWriter  # noqa: F401
+from .frame_writer import GifFrameWriter, RawFrameWriter  # noqa: F401
+from .text_cache import TextCache  # noqa: F401
+from .glyph_atlas import GlyphAtlas, GlyphLayout  # noqa: F401
@@ -0,0 +1,94 @@
+from .rotation import Rotation
+
+
+class Damage:
+    """
+        Damage - helpers for the rectangles of a Layout that changed.
+
+        A rectangle is a 4-tuple `(left, top, right, bottom)`, where right and
+        bottom are exclusive: the same as a Pillow box.
+    """
+
+    @staticmethod
+    def offset(rect, xy):
+        x, y = xy
+        return (rect[0] + x, rect[1] + y, rect[2] + x, rect[3] + y)
+
+    @staticmethod
+    def area(rects):
+        """The total area of the rectangles, counting any overlap twice."""
+        return sum([(r[2] - r[0]) * (r[3] - r[1]) for r in rects])
+
+    @staticmethod
+    def union(rect1, rect2):
+        """The bounding box of both rectangles."""
+        return (
+            min(rect1[0], rect2[0]), min(rect1[1], rect2[1]),
+            max(rect1[2], rect2[2]), max(rect1[3], rect2[3])
+        )
+
+    @staticmethod
+    def intersection(rect1, rect2):
+        """The rectangle that both rectangles cover, or None."""
+        rect = (
+            max(rect1[0], rect2[0]), max(rect1[1], rect2[1]),
+            min(rect1[2], rect2[2]), min(rect1[3], rect2[3])
+        )
+        if rect[0] >= rect[2] or rect[1] >= rect[3]:
+            return None
+        return rect
+
+    @staticmethod
+    def overlaps(rect1, rect2, gap=0):
+        """Whether the rectangles overlap, or are within gap pixels."""
+        return (
+            rect1[0] < rect2[2] + gap and rect2[0] < rect1[2] + gap and
+            rect1[1] < rect2[3] + gap and rect2[1] < rect1[3] + gap
+        )
+
+    @staticmethod
+    def coalesce(rects, gap=0):
+        """Merge overlapping rectangles into their bounding boxes.
+
+        Repeats until no two rectangles overlap, so the result can be handed
+        straight to a display driver as a list of update windows.
+
+        Parameters
+        ----------
+        rects: list
+            The rectangles to merge.
+        gap: int
+            Also merge rectangles that are up to this many pixels apart.
+            Use 1 to merge rectangles that touch.
+        """
+        merged = [tuple(rect) for rect in rects]
+        changed = True
+        while changed:
+            changed = False
+            result = []
+            for rect in merged:
+                for index, other in enumerate(result):
+                    if Damage.overlaps(rect, other, gap):
+                        result[index] = Damage.union(rect, other)
+                        changed = True
+                        break
+                else:
+                    result.append(rect)
+            merged = result
+        return merged
+
+    @staticmethod
+    def rotate(rects, size, rotation):
+        """Map rectangles on an image of size into the rotated image.
+
+        This matches the rotation that `Layout.draw()` applies: the image
+        is turned clockwise by `rotation.value * 90` degrees.
+        """
+        w, h = size
+        if rotation == Rotation.RIGHT:
+            return [(h - r[3], r[0], h - r[1], r[2]) for r in rects]
+        elif rotation == Rotation.DOWN:
+            return [(w - r[2], h - r[3], w - r[0], h - r[1]) for r in rects]
+        elif rotation == Rotation.LEFT:
+            return [(r[1], w - r[2], r[3], w - r[0]) for r in rects]
+        return list(rects)
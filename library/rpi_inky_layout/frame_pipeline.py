@@ -0,0 +1,102 @@
+from collections import namedtuple
+from time import monotonic
+
+from .damage import Damage
+
+Frame = namedtuple('Frame', ['image', 'boxes', 'full'])
+Frame.__doc__ = """A frame for the display.
+
+    image: a copy of the root layout's drawn image, which later draws
+        don't change.
+    boxes: the (left, top, right, bottom) boxes to refresh, coalesced; the
+        whole image for a full refresh.
+    full: whether to do a full refresh, rather than a partial one.
+"""
+
+
+class FramePipeline:
+    """
+        FramePipeline - turn a stream of changes to a Layout tree into as few
+        display refreshes as possible.
+
+        Call `notify()` whenever you change the tree (e.g. after `setImage`),
+        and `poll()` regularly, e.g. from your main loop. `poll()` draws the
+        root and passes a Frame to `sink(frame)` only when something has
+        changed since the last frame, and at least `minInterval` seconds have
+        passed since it. However many changes were notified in between, only
+        the latest composite is drawn and sent.
+
+        When the damaged area is at least `fullRefreshArea` of the image, the
+        frame is a full refresh; otherwise it is a partial refresh of the
+        damaged boxes.
+    """
+
+    def __init__(
+            self, root, sink, minInterval=0, fullRefreshArea=0.5, gap=0,
+            clock=monotonic):
+        """
+            Parameters
+            ----------
+            root: Layout
+                The top-level layout.
+            sink: function
+                Called with each Frame.
+            minInterval: float
+                The minimum seconds between two frames. Default: 0.
+            fullRefreshArea: float
+                The fraction of the image's area that, once damaged, makes
+                the frame a full refresh. Default: 0.5.
+            gap: int
+                Damaged boxes within gap pixels of each other are merged.
+                Default: 0.
+            clock: function
+                Returns the time in seconds. Default: time.monotonic.
+        """
+        self.root = root
+        self.sink = sink
+        self.minInterval = minInterval
+        self.fullRefreshArea = fullRefreshArea
+        self.gap = gap
+        self.clock = clock
+        self.frameCount = 0
+        self._pending = False
+        self._lastFrame = None
+
+    def notify(self):
+        """Note that the tree has changed."""
+        self._pending = True
+
+    def wait(self):
+        """The seconds until the next frame may be sent; 0 if it may now."""
+        if self._lastFrame is None:
+            return 0
+        return max(0, self._lastFrame + self.minInterval - self.clock())
+
+    def poll(self, force=False):
+        """Send a frame, if there are changes and minInterval has passed.
+
+        Parameters
+        ----------
+        force: bool
+            Send the frame now, even if minInterval hasn't passed.
+
+        Returns the Frame that was sent, or None.
+        """
+        if not self._pending or not force and self.wait() > 0:
+            return None
+        self._pending = False
+        image = self.root.draw()
+        if not self.root.redrawCount:
+            return None
+        boxes = Damage.coalesce(self.root.damage(), self.gap)
+        width, height = image.size
+        full = Damage.area(boxes) >= self.fullRefreshArea * width * height
+        if full:
+            boxes = [(0, 0, width, height)]
+        # the root draws into the same image every time, and the sink may
+        # keep the frame (e.g. to hand it to another thread)
+        frame = Frame(image.copy(), boxes, full)
+        self._lastFrame = self.clock()
+        self.frameCount += 1
+        self.sink(frame)
+        return frame
@@ -0,0 +1,236 @@
+import abc
+import struct
+
+import numpy
+from PIL import GifImagePlugin, Image
+
+
+class FrameWriter(abc.ABC):
+    """
+        FrameWriter - write a sequence of drawn images to one stream, storing
+        only what changed from one frame to the next.
+
+        Give each frame to `add`, e.g. `writer.add(topLayout.draw())`, then
+        `close()` the writer (or use it in a `with` block). Only the previous
+        frame and the frame waiting to be written are kept, so memory doesn't
+        grow with the length of the sequence. A frame that is the same as the
+        one before it just makes that one last longer.
+
+        Subclasses write the stream, and must implement `_writeFrame`: see
+        `GifFrameWriter` and `RawFrameWriter`.
+    """
+
+    def __init__(self, fp, duration=100):
+        """
+            Parameters
+            ----------
+            fp: str or file
+                The file name, or a file object opened for binary writing.
+            duration: int
+                The default milliseconds to show each frame for.
+        """
+        self._ownsFile = isinstance(fp, str)
+        self.fp = open(fp, 'wb') if self._ownsFile else fp
+        self.duration = duration
+        self.size = None
+        self.frameCount = 0
+        self._previous = None
+        self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def add(self, image, duration=None):
+        """Add image as the next frame.
+
+        Returns the (left, top, right, bottom) box that changed, or None if
+        nothing did.
+        """
+        if duration is None:
+            duration = self.duration
+        frame = self._prepare(image)
+        if self.size is None:
+            self.size = frame.size
+            self._writeHeader(frame)
+        elif frame.size != self.size:
+            raise ValueError("Frames must all be {s}, not {f}".format(
+                s=self.size, f=frame.size))
+        box = self._changedBox(frame)
+        if box is None:
+            crop, offset, pendingDuration = self._pending
+            self._pending = (crop, offset, pendingDuration + duration)
+            return None
+        self._flush()
+        self._pending = (frame.crop(box), box[:2], duration)
+        return box
+
+    def close(self):
+        """Write the last frame and end the stream."""
+        if self.fp is None:
+            return
+        self._flush()
+        self._writeTrailer()
+        if self._ownsFile:
+            self.fp.close()
+        self.fp = None
+
+    def _changedBox(self, frame):
+        """The bounding box of the pixels that differ from the last frame."""
+        current = numpy.asarray(frame)
+        previous = self._previous
+        self._previous = current
+        if previous is None:
+            return (0, 0) + frame.size
+        changed = current != previous
+        if changed.ndim == 3:
+            changed = changed.any(axis=2)
+        rows = changed.any(axis=1)
+        columns = changed.any(axis=0)
+        if not rows.any():
+            return None
+        width, height = frame.size
+        return (
+            int(columns.argmax()), int(rows.argmax()),
+            width - int(columns[::-1].argmax()),
+            height - int(rows[::-1].argmax()))
+
+    def _flush(self):
+        if self._pending is not None:
+            self._writeFrame(*self._pending)
+            self.frameCount += 1
+            self._pending = None
+
+    def _prepare(self, image):
+        """The frame to store, for image."""
+        return image
+
+    def _writeHeader(self, frame):
+        pass
+
+    @abc.abstractmethod
+    def _writeFrame(self, crop, offset, duration):
+        """Write crop, the box of the frame at offset that changed, to show
+        for duration milliseconds."""
+
+    def _writeTrailer(self):
+        pass
+
+
+class GifFrameWriter(FrameWriter):
+    """
+        GifFrameWriter - write frames as an animated GIF, as they're added.
+
+        Every frame uses the same palette: the palette of "P" frames (which
+        are assumed to share it, as in a "P" mode Layout), the palette you
+        give, or the 216 web-safe colours. Each frame after the first
+        stores just the box that changed, and leaves the rest of the
+        previous frame in place.
+    """
+
+    WEB_PALETTE = [
+        value
+        for r in range(0, 256, 51)
+        for g in range(0, 256, 51)
+        for b in range(0, 256, 51)
+        for value in (r, g, b)
+    ]
+
+    def __init__(self, fp, duration=100, loop=0, palette=None):
+        """
+            Parameters
+            ----------
+            fp: str or file
+                The file name, or a file object opened for binary writing.
+            duration: int
+                The default milliseconds to show each frame for.
+            loop: int
+                How many times to loop; 0 loops forever, None plays once.
+            palette: list
+                A flat list of RGB values to map frames that aren't "P"
+                onto, as for Layout; e.g. `Layout.DEFAULT_PALETTE`.
+                Default: WEB_PALETTE.
+        """
+        super().__init__(fp, duration)
+        self.loop = loop
+        self._paletteImage = Image.new("P", (1, 1), 0)
+        self._paletteImage.putpalette(
+            self.WEB_PALETTE if palette is None else palette)
+
+    def _prepare(self, image):
+        if image.mode == "P":
+            return image
+        return image.convert("RGB").quantize(
+            palette=self._paletteImage, dither=0)
+
+    def _writeHeader(self, frame):
+        info = {} if self.loop is None else {'loop': self.loop}
+        header, usedColours = GifImagePlugin.getheader(
+            frame.copy(), None, info)
+        self.fp.write(b"".join(header))
+
+    def _writeFrame(self, crop, offset, duration):
+        self.fp.write(b"".join(GifImagePlugin.getdata(
+            crop, offset, duration=duration, disposal=1)))
+
+    def _writeTrailer(self):
+        if self.size is not None:
+            self.fp.write(b";")
+
+
+class RawFrameWriter(FrameWriter):
+    """
+        RawFrameWriter - write frames as uncompressed changed boxes.
+
+        The stream starts with a header: b'RILF', then the width, height,
+        length of the mode name (as '<HHH'), the mode name, and for "P"
+        frames the 768-byte palette. Each frame is then its left, top,
+        width, height and duration in milliseconds (as '<HHHHI'), followed by
+        the changed box's pixels, as `Image.tobytes()`. `frames` reads it
+        back.
+    """
+
+    MAGIC = b'RILF'
+    HEADER = struct.Struct('<HHH')
+    FRAME = struct.Struct('<HHHHI')
+
+    def _writeHeader(self, frame):
+        mode = frame.mode.encode('ascii')
+        self.fp.write(
+            self.MAGIC + self.HEADER.pack(
+                frame.size[0], frame.size[1], len(mode)) + mode)
+        if frame.mode == "P":
+            palette = frame.getpalette() or []
+            self.fp.write(bytes(palette[:768]).ljust(768, b'\0'))
+
+    def _writeFrame(self, crop, offset, duration):
+        self.fp.write(self.FRAME.pack(*offset + crop.size + (duration,)))
+        self.fp.write(crop.tobytes())
+
+    @staticmethod
+    def frames(fp):
+        """Read a raw stream back, one (image, duration) at a time.
+
+        The same image is updated and yielded each time: copy it if you
+        want to keep it.
+        """
+        header = RawFrameWriter.HEADER
+        frame = RawFrameWriter.FRAME
+        if fp.read(len(RawFrameWriter.MAGIC)) != RawFrameWriter.MAGIC:
+            raise ValueError("Not a raw frame stream")
+        width, height, modeLength = header.unpack(fp.read(header.size))
+        mode = fp.read(modeLength).decode('ascii')
+        image = Image.new(mode, (width, height))
+        if mode == "P":
+            image.putpalette(fp.read(768))
+        while True:
+            data = fp.read(frame.size)
+            if len(data) < frame.size:
+                return
+            x, y, w, h, duration = frame.unpack(data)
+            byteCount = len(Image.new(mode, (w, 1)).tobytes()) * h
+            crop = Image.frombytes(mode, (w, h), fp.read(byteCount))
+            image.paste(crop, (x, y))
+            yield image, duration
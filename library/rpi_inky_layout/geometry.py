@@ -0,0 +1,345 @@
+from collections import namedtuple
+import numpy
+from numpy import floor
+
+from .index_order import IndexOrder
+
+Packing = namedtuple('Packing', [
+    'spacers', 'slotSize', 'slotSizeError', 'slots', 'paddings', 'topLefts'
+])
+Packing.__doc__ = """How a layout's children are packed into it.
+
+    spacers: the width of the spacer before each child, after the first.
+    slotSize: the size of one slot (one unit of packingBias), along the
+        packing direction first.
+    slotSizeError: the pixels lost by rounding the slots down.
+    slots: the size of each child.
+    paddings: the pixels added to each spacer to make up the error, or
+        None if the error was too small to add any.
+    topLefts: the top-left of each child, relative to the layout.
+"""
+
+
+class Geometry():
+    """
+        Geometry - the packing calculations of a Layout, as pure functions.
+
+        Everything is calculated from the layout's size, borders and
+        packingMode, and the packingBias of each of its children, so the
+        same numbers come out whether a tree is built one `addLayer` at a
+        time or compiled from a spec in one pass.
+    """
+
+    @staticmethod
+    def transform(packingMode, twod):
+        """Swap (x, y) for 'v' packing, so the packing direction is first."""
+        if packingMode == 'v':
+            return tuple(reversed(twod))
+        return twod
+
+    @staticmethod
+    def drawableSize(size, borders):
+        w, h = size
+        bt, br, bb, bl = borders
+        return (w - bl - br, h - bt - bb)
+
+    @staticmethod
+    def idealSpacerWidth(borders, packingMode):
+        bt, br, bb, bl = borders
+        if packingMode == 'h':
+            return bl
+        else:  # packingMode == 'v'
+            return bt
+
+    @staticmethod
+    def slotSize(drawableSize, spacers, biases, packingMode):
+        """The size of one slot, and the pixels lost by rounding it down."""
+        dw, dw1 = Geometry.transform(packingMode, drawableSize)
+        w = dw - sum(spacers)
+        if len(biases) == 1:
+            return (w, dw1), 0.0
+        w = w * 1.0
+        slotCount = sum(biases)
+        if slotCount > 1:
+            w = w / slotCount
+        intW = int(floor(w))
+        return (intW, dw1), (w - intW) * slotCount
+
+    @staticmethod
+    def paddings(slotSizeError, childCount):
+        """The additional width to put into each spacer, to even things out."""
+        _errorWidth = int(floor(slotSizeError + 0.49))
+        _paddingCount = childCount - 1
+        _paddings = [0] * _paddingCount
+        _indexes = IndexOrder.alternating(_paddingCount)
+        while _errorWidth > 0:
+            _errorWidth -= 1
+            _index = _errorWidth % _paddingCount
+            _paddings[_indexes[_index]] += 1
+        return _paddings
+
+    @staticmethod
+    def topLefts(biases, spacers, slotSize, borders, packingMode):
+        """All the children's top-lefts, in a single pass.
+
+        Each child starts after the slots and spacers of all the previous
+        children, so the starts are exclusive prefix sums of the packing
+        biases and the spacer widths.
+        """
+        biases = numpy.array(biases)
+        slotStarts = numpy.cumsum(biases) - biases
+        spacerStarts = numpy.cumsum([0] + list(spacers))
+        tops = spacerStarts + slotStarts * slotSize[0] + borders[0]
+        left = borders[3]  # 0 offset from drawable area, NOT parent area
+        return [
+            Geometry.transform(packingMode, (top, left))
+            for top in tops.tolist()
+        ]
+
+    @staticmethod
+    def pack(size, borders, packingMode, biases):
+        """Pack children with the packing biases into a layout.
+
+        Parameters
+        ----------
+        size: tuple
+            The size of the layout.
+        borders: tuple
+            Its (top, right, bottom, left) borders.
+        packingMode: str
+            'h' or 'v'.
+        biases: list
+            The packingBias of each child, in order.
+
+        Returns a Packing.
+        """
+        spacers = [
+            Geometry.idealSpacerWidth(borders, packingMode)
+            for c in range(len(biases) - 1)
+        ]
+        slotSize, slotSizeError = Geometry.slotSize(
+            Geometry.drawableSize(size, borders), spacers, biases,
+            packingMode)
+        slots = [
+            Geometry.transform(
+                packingMode,
+                (slotSize[0] * bias, slotSize[1])
+                if len(biases) > 1 else slotSize)
+            for bias in biases
+        ]
+        paddings = None
+        if slotSizeError > 0.5:
+            paddings = Geometry.paddings(slotSizeError, len(biases))
+            spacers = [s + p for s, p in zip(spacers, paddings)]
+        topLefts = Geometry.topLefts(
+            biases, spacers, slotSize, borders, packingMode)
+        return Packing(
+            spacers, slotSize, slotSizeError, slots, paddings, topLefts)
+
+    @staticmethod
+    def frameRects(size, borders):
+        """The border, as rectangles for ImageDraw (right/bottom inclusive).
+
+        Only the top border width is used, for all four sides.
+        """
+        w = borders[0]
+        width, height = size
+        if w <= 0:
+            return []
+        return [
+            (0, 0, width - 1, w - 1),
+            (0, height - w, width - 1, height - 1),
+            (0, 0, w - 1, height - 1),
+            (width - w, 0, width - 1, height - 1),
+        ]
+
+    @staticmethod
+    def spacerRects(size, packingMode, spacers, topLefts):
+        """The spacers, as rectangles for ImageDraw (right/bottom inclusive).
+        """
+        width, height = size
+        rects = []
+        for w, (x, y) in zip([0] + list(spacers), topLefts):
+            if w <= 0:
+                continue
+            if packingMode == 'h':
+                rects.append((x - w, y, x - 1, height - y - 1))
+            else:
+                rects.append((x, y - w, width - x - 1, y - 1))
+        return rects
+
+    @staticmethod
+    def overlapsChildren(rects, childRects):
+        """Whether any of the (inclusive) rects overlap any child.
+
+        childRects are (x, y, width, height), one row per child. Children
+        overlap the frame when the borders aren't the same on every side,
+        since the frame is painted with the top border's width all round.
+        """
+        if not len(rects) or not len(childRects):
+            return False
+        rects = numpy.array(rects).reshape(-1, 1, 4)
+        x, y, w, h = numpy.asarray(childRects).T
+        return bool((
+            (rects[..., 0] < x + w) & (x <= rects[..., 2]) &
+            (rects[..., 1] < y + h) & (y <= rects[..., 3])
+        ).any())
+
+    @staticmethod
+    def tracks(length, biases, gap):
+        """Split length into rows or columns, weighted by biases.
+
+        Like packed children, the tracks are rounded down to whole units of
+        the total bias, and the pixels left over widen the gaps between
+        them, alternating from the outside in.
+
+        Returns the start and length of each track, from 0.
+        """
+        count = len(biases)
+        available = length - gap * (count - 1)
+        if count == 1:
+            return [0], [available]
+        unit = available // sum(biases)
+        lengths = numpy.array(biases) * unit
+        gaps = numpy.array(
+            Geometry.paddings(available - lengths.sum(), count)) + gap
+        starts = numpy.cumsum(
+            numpy.concatenate(([0], lengths[:-1] + gaps)).astype(int))
+        return starts.tolist(), lengths.tolist()
+
+    @staticmethod
+    def placeCell(rows, columns, placed, cell, span):
+        """Where a grid child with span goes.
+
+        Parameters
+        ----------
+        rows, columns: int
+            The size of the grid.
+        placed: list
+            The (cell, span) of the children already in the grid.
+        cell: tuple
+            The (row, column) asked for, or None for the first free cell,
+            in row-major order, that the span fits in. The cells it spans
+            mustn't be taken already.
+        span: tuple
+            The (rows, columns) the child spans.
+        """
+        rowSpan, columnSpan = span
+        if rowSpan < 1 or columnSpan < 1:
+            raise ValueError("Spans must be at least 1: {s}".format(s=span))
+        taken = set([
+            (r + i, c + j)
+            for (r, c), (rs, cs) in placed
+            for i in range(rs)
+            for j in range(cs)
+        ])
+        if cell is not None:
+            row, column = cell
+            if row < 0 or column < 0 or row + rowSpan > rows or \
+                    column + columnSpan > columns:
+                raise ValueError("{c} {s} is outside the {r}x{cs} grid".format(
+                    c=cell, s=span, r=rows, cs=columns))
+            if any([
+                (row + i, column + j) in taken
+                for i in range(rowSpan)
+                for j in range(columnSpan)
+            ]):
+                raise ValueError("{c} {s} overlaps another child".format(
+                    c=cell, s=span))
+            return (row, column)
+        for row in range(rows - rowSpan + 1):
+            for column in range(columns - columnSpan + 1):
+                if not any([
+                    (row + i, column + j) in taken
+                    for i in range(rowSpan)
+                    for j in range(columnSpan)
+                ]):
+                    return (row, column)
+        raise ValueError("There's no room for a {s} span in the grid".format(
+            s=span))
+
+    @staticmethod
+    def gridTracks(size, borders, rowBias, columnBias):
+        """The (starts, lengths) of the columns and of the rows."""
+        bt, br, bb, bl = borders
+        width, height = Geometry.drawableSize(size, borders)
+        xs, widths = Geometry.tracks(width, columnBias, bl)
+        ys, heights = Geometry.tracks(height, rowBias, bt)
+        return (
+            ([x + bl for x in xs], widths),
+            ([y + bt for y in ys], heights))
+
+    @staticmethod
+    def gridPack(size, borders, rowBias, columnBias, cells, spans):
+        """Pack children into the cells of a grid, in one pass.
+
+        Returns a Packing with the slots and top-lefts of the children, and
+        the size of one unit of bias as the slotSize.
+        """
+        (xs, widths), (ys, heights) = Geometry.gridTracks(
+            size, borders, rowBias, columnBias)
+        xs, widths, ys, heights = [
+            numpy.array(a) for a in (xs, widths, ys, heights)]
+        cells = numpy.array(cells, dtype=int).reshape(-1, 2)
+        spans = numpy.array(spans, dtype=int).reshape(-1, 2)
+        rows, columns = cells[:, 0], cells[:, 1]
+        lastRows = rows + spans[:, 0] - 1
+        lastColumns = columns + spans[:, 1] - 1
+        x0, y0 = xs[columns], ys[rows]
+        x1 = xs[lastColumns] + widths[lastColumns]
+        y1 = ys[lastRows] + heights[lastRows]
+        slotSize = (
+            int(widths[0] // columnBias[0]), int(heights[0] // rowBias[0]))
+        return Packing(
+            [], slotSize, 0.0,
+            [tuple(slot) for slot in numpy.stack(
+                (x1 - x0, y1 - y0), axis=1).tolist()],
+            None,
+            [tuple(tl) for tl in numpy.stack((x0, y0), axis=1).tolist()])
+
+    @staticmethod
+    def gridGapRects(size, borders, rowBias, columnBias, cells, spans):
+        """The gaps between grid cells that no child covers, as rectangles
+        for ImageDraw (right/bottom inclusive).
+        """
+        (xs, widths), (ys, heights) = Geometry.gridTracks(
+            size, borders, rowBias, columnBias)
+        # tracks alternate cell, gap, cell, ..., gap, cell in each direction
+        xTracks = Geometry._interleaved(xs, widths)
+        yTracks = Geometry._interleaved(ys, heights)
+        covered = numpy.zeros((len(yTracks), len(xTracks)), dtype=bool)
+        for (row, column), (rowSpan, columnSpan) in zip(cells, spans):
+            covered[
+                2 * row:2 * (row + rowSpan) - 1,
+                2 * column:2 * (column + columnSpan) - 1] = True
+        isGap = numpy.add.outer(
+            numpy.arange(len(yTracks)) % 2, numpy.arange(len(xTracks)) % 2
+        ) > 0
+        paint = isGap & ~covered
+        rects = []
+        for i, (y0, y1) in enumerate(yTracks):
+            if y1 < y0:
+                continue
+            start = None
+            for j, (x0, x1) in enumerate(xTracks):
+                if x1 < x0:
+                    continue
+                if paint[i, j]:
+                    start = x0 if start is None else start
+                    end = x1
+                elif start is not None:
+                    rects.append((start, y0, end, y1))
+                    start = None
+            if start is not None:
+                rects.append((start, y0, end, y1))
+        return rects
+
+    @staticmethod
+    def _interleaved(starts, lengths):
+        """The inclusive (first, last) of each track and each gap."""
+        tracks = []
+        for i, (start, length) in enumerate(zip(starts, lengths)):
+            if i > 0:
+                tracks.append((tracks[-1][1] + 1, start - 1))
+            tracks.append((start, start + length - 1))
+        return tracks
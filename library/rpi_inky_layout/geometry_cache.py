@@ -0,0 +1,214 @@
+from enum import Enum
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import numpy
+
+from .geometry import Packing
+from .layout import Layout
+from .spec import LayoutSpec, PlanNode
+
+
+class GeometryCache():
+    """
+        GeometryCache - compiled layout spec plans, kept on disk.
+
+        A device that wakes up, draws one frame and goes back to sleep
+        builds the same tree every time. With a cache, the geometry is only
+        calculated the first time; after that it's read back from a small
+        binary file:
+
+            cache = GeometryCache("/var/cache/inky-layout")
+            topLayout = cache.build(spec)
+
+        Files are keyed by a hash of the spec and the library version, and
+        start with a header that is checked when they are read. Anything
+        that doesn't match, or can't be read, is recalculated (and the file
+        replaced).
+    """
+
+    MAGIC = b'RILG'
+    FORMAT = 2
+    # magic, format, spec hash, length of the library version
+    HEADER = struct.Struct('<4sH32sH')
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def libraryVersion():
+        from . import __version__
+        return __version__
+
+    @staticmethod
+    def specHash(spec):
+        """A stable hash of the spec and the library version."""
+        text = json.dumps(
+            [GeometryCache.libraryVersion(), spec], sort_keys=True,
+            separators=(',', ':'),
+            default=lambda o: o.name if isinstance(o, Enum) else str(o))
+        return hashlib.sha256(text.encode('utf-8')).digest()
+
+    def path(self, spec):
+        return os.path.join(
+            self.directory, GeometryCache.specHash(spec).hex() + '.geom')
+
+    def compile(self, spec):
+        """The spec's plan: from the cache, or compiled and then cached."""
+        plan = self.load(spec)
+        if plan is None:
+            plan = LayoutSpec.compile(spec)
+            self.store(spec, plan)
+        return plan
+
+    def build(self, spec):
+        """Build the spec's Layout tree using the cached plan."""
+        return LayoutSpec.build(spec, self.compile(spec))
+
+    def load(self, spec):
+        """The cached plan for the spec, or None if there isn't one."""
+        try:
+            with open(self.path(spec), 'rb') as f:
+                data = f.read()
+            return GeometryCache.decode(spec, data)
+        except (OSError, ValueError, IndexError, struct.error):
+            return None
+
+    def store(self, spec, plan):
+        """Write the plan to the cache, atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(GeometryCache.encode(spec, plan))
+            os.replace(tmp, self.path(spec))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @staticmethod
+    def encode(spec, plan):
+        """The plan as bytes: a header, then int32s, then float64s."""
+        ints = []
+        floats = []
+        GeometryCache._encodeNode(plan, ints, floats)
+        version = GeometryCache.libraryVersion().encode('utf-8')
+        return b''.join([
+            GeometryCache.HEADER.pack(
+                GeometryCache.MAGIC, GeometryCache.FORMAT,
+                GeometryCache.specHash(spec), len(version)),
+            version,
+            struct.pack('<II', len(ints), len(floats)),
+            numpy.array(ints, dtype='<i4').tobytes(),
+            numpy.array(floats, dtype='<f8').tobytes(),
+        ])
+
+    @staticmethod
+    def decode(spec, data):
+        """The plan from encoded bytes, or a ValueError if they don't match.
+        """
+        header = GeometryCache.HEADER
+        magic, fmt, specHash, versionLength = header.unpack_from(data)
+        offset = header.size
+        version = data[offset:offset + versionLength].decode('utf-8')
+        offset += versionLength
+        if (
+            magic != GeometryCache.MAGIC or fmt != GeometryCache.FORMAT or
+            specHash != GeometryCache.specHash(spec) or
+            version != GeometryCache.libraryVersion()
+        ):
+            raise ValueError("Not a geometry cache for this spec")
+        intCount, floatCount = struct.unpack_from('<II', data, offset)
+        offset += 8
+        if len(data) != offset + intCount * 4 + floatCount * 8:
+            raise ValueError("Truncated geometry cache")
+        ints = numpy.frombuffer(
+            data, dtype='<i4', count=intCount, offset=offset).tolist()
+        # reversed, so they can be popped off in order
+        floats = numpy.frombuffer(
+            data, dtype='<f8', count=floatCount,
+            offset=offset + intCount * 4)[::-1].tolist()
+        plan, i = GeometryCache._decodeNode(spec, (0, 0), ints, 0, floats)
+        if i != len(ints) or floats:
+            raise ValueError("The geometry cache has extra numbers")
+        return plan
+
+    @staticmethod
+    def _encodeNode(plan, ints, floats):
+        ints.extend(plan.size + plan.topLeft + plan.rect)
+        ints.append(len(plan.children))
+        packing = plan.packing
+        if packing is None:
+            return
+        floats.append(packing.slotSizeError)
+        ints.extend(packing.slotSize)
+        ints.append(len(packing.spacers))
+        ints.extend(packing.spacers)
+        [ints.extend(slot) for slot in packing.slots]
+        ints.append(-1 if packing.paddings is None else len(packing.paddings))
+        ints.extend(packing.paddings or ())
+        [ints.extend(topLeft) for topLeft in packing.topLefts]
+        ints.append(len(plan.spacerRects))
+        [ints.extend(rect) for rect in plan.spacerRects]
+        [
+            GeometryCache._encodeNode(child, ints, floats)
+            for child in plan.children
+        ]
+
+    @staticmethod
+    def _pairs(ints, i, count):
+        return tuple(zip(ints[i:i + count * 2:2], ints[i + 1:i + count * 2:2]))
+
+    @staticmethod
+    def _decodeNode(spec, defaultBorder, ints, i, floats):
+        """Decode a node and its children from ints[i:].
+
+        Returns the node, and the index of the next one.
+        """
+        args = LayoutSpec._layoutArgs(spec, defaultBorder)
+        borders, borderColour = Layout._parseBorder(args['border'])
+        size, topLeft, rect = (
+            tuple(ints[i:i + 2]), tuple(ints[i + 2:i + 4]),
+            tuple(ints[i + 4:i + 8]))
+        n = ints[i + 8]
+        i += 9
+        childSpecs = spec.get('children', [])
+        if n != len(childSpecs):
+            raise ValueError("The geometry cache has the wrong children")
+        packing = None
+        spacerRects = ()
+        children = []
+        if n:
+            pairs = GeometryCache._pairs
+            slotSizeError = floats.pop()
+            slotSize, spacerCount = tuple(ints[i:i + 2]), ints[i + 2]
+            i += 3
+            spacers = tuple(ints[i:i + spacerCount])
+            i += spacerCount
+            slots = pairs(ints, i, n)
+            i += 2 * n
+            paddingCount = ints[i]
+            i += 1
+            paddings = None
+            if paddingCount >= 0:
+                paddings = tuple(ints[i:i + paddingCount])
+                i += paddingCount
+            topLefts = pairs(ints, i, n)
+            i += 2 * n
+            rectCount = ints[i]
+            spacerRects = tuple([
+                tuple(ints[j:j + 4])
+                for j in range(i + 1, i + 1 + rectCount * 4, 4)
+            ])
+            i += 1 + rectCount * 4
+            packing = Packing(
+                spacers, slotSize, slotSizeError, slots, paddings, topLefts)
+            for child in childSpecs:
+                node, i = GeometryCache._decodeNode(child, 0, ints, i, floats)
+                children.append(node)
+        return PlanNode(
+            spec.get('name'), rect, size, topLeft, args['rotation'],
+            args['packingMode'], args['packingBias'], borders, borderColour,
+            spacerRects, packing, tuple(children)), i
@@ -0,0 +1,200 @@
+import numpy
+from PIL import Image, ImageDraw
+
+from .layout import Layout
+from .position import Position
+from .text_cache import TextCache
+
+
+class GlyphAtlas:
+    """
+        GlyphAtlas - every character of a font, rendered once into one "P"
+        image of equal-sized cells.
+
+        Strings are then composed by slicing cells out of the atlas with
+        numpy, without calling the font again. Every cell is the same size,
+        so the characters are spaced like a monospaced font: this suits the
+        digits of clocks, counters and sensor readings.
+
+        Use it with a `GlyphLayout` to update just the characters that
+        changed.
+    """
+
+    DIGITS = "0123456789 .:-+%"
+
+    def __init__(
+            self, font, characters=DIGITS, palette=Layout.DEFAULT_PALETTE,
+            foreground=Layout.BLACK, background=Layout.WHITE):
+        """
+            Parameters
+            ----------
+            font: PIL.ImageFont
+                The font to render the characters in.
+            characters: str
+                The characters to render. Default: DIGITS.
+            palette: tuple
+                The palette of the atlas. Default: Layout.DEFAULT_PALETTE.
+            foreground: int
+                The palette index of the characters. Default: Layout.BLACK.
+            background: int
+                The palette index around them. Default: Layout.WHITE.
+        """
+        self.characters = characters
+        self.palette = palette
+        self.foreground = foreground
+        self.background = background
+        self._indexes = dict([(c, i) for i, c in enumerate(characters)])
+        boxes = [TextCache.textBox(font, c) for c in characters]
+        left = min([0] + [box[0] for box in boxes])
+        top = min([box[1] for box in boxes])
+        right = max([box[2] for box in boxes] + [
+            int(TextCache.textLength(font, c) + 0.5) for c in characters])
+        bottom = max([box[3] for box in boxes])
+        self.cellSize = (right - left, bottom - top)
+        width, height = self.cellSize
+        self.image = self._newImage((width * len(characters), height))
+        for i, character in enumerate(characters):
+            # each character is drawn on its own, so it can't spill into
+            # the cells next to it
+            cell = self._newImage(self.cellSize)
+            ImageDraw.Draw(cell).text(
+                (-left, -top), character, fill=foreground, font=font)
+            self.image.paste(cell, (i * width, 0))
+        # (character, row, column)
+        self._cells = numpy.asarray(self.image).reshape(
+            height, len(characters), width).transpose(1, 0, 2)
+
+    def _newImage(self, size, index=None):
+        image = Image.new(
+            "P", size, self.background if index is None else index)
+        image.putpalette(self.palette)
+        return image
+
+    def colour(self, index, mode="P"):
+        """The palette index as a colour for an image of mode."""
+        if mode == "P":
+            return index
+        return self._newImage((1, 1), index).convert(mode).getpixel((0, 0))
+
+    def index(self, character):
+        """The cell of character in the atlas."""
+        try:
+            return self._indexes[character]
+        except KeyError:
+            raise ValueError("{c!r} isn't in the atlas".format(c=character))
+
+    def textSize(self, text):
+        """The size of text, composed from the atlas."""
+        return (self.cellSize[0] * len(text), self.cellSize[1])
+
+    def compose(self, text):
+        """text as a numpy array of palette indices, (rows, columns)."""
+        width, height = self.cellSize
+        cells = self._cells[[self.index(c) for c in text]]
+        return cells.transpose(1, 0, 2).reshape(height, width * len(text))
+
+    def render(self, text):
+        """text as a "P" image, with the atlas's palette."""
+        image = Image.fromarray(self.compose(text), "P")
+        image.putpalette(self.palette)
+        return image
+
+
+class GlyphLayout(Layout):
+    """
+        GlyphLayout - a childless layout that shows a line of text from a
+        GlyphAtlas.
+
+        `setText` only redraws the cells whose characters changed, and marks
+        just those cells dirty, so `damage()` reports them for a partial
+        refresh. Add it to a tree with `addLayout`.
+    """
+
+    def __init__(
+            self, atlas, text="", position=Position.middle_centre,
+            size=(250, 122), **kwargs):
+        """
+            Parameters
+            ----------
+            atlas: GlyphAtlas
+                Where the characters come from.
+            text: str
+                The text to show first.
+            position: function
+                The `Position` function that places the text in the layout.
+                Default: Position.middle_centre.
+            size: tuple
+                The size of the layout, until it is added to another.
+
+            Any other keyword arguments are passed on to Layout.
+        """
+        self.atlas = atlas
+        self.position = position
+        self.text = ""
+        self._shownAt = None
+        kwargs.setdefault('imageMode', "P")
+        kwargs.setdefault('palette', atlas.palette)
+        super().__init__(size, **kwargs)
+        self.setText(text)
+
+    def _setSize(self, size):
+        # resize() and LayoutSpec both come through here
+        super()._setSize(size)
+        self._image = None
+        self._shownAt = None
+        self.setText(self.text)
+
+    def setText(self, text):
+        """Show text, redrawing only the characters that changed.
+
+        Returns the (left, top, right, bottom) boxes that were redrawn.
+        """
+        # check every character before changing anything
+        [self.atlas.index(c) for c in text]
+        x, y = self._textOrigin(text)
+        cellWidth, cellHeight = self.atlas.cellSize
+        if self._image is None or self._shownAt != (x, y, len(text)):
+            # the text moved: clear the old text, and draw all of the new
+            old = self._textBox(self.text, *self._shownAt[:2]) \
+                if self._shownAt else None
+            background = self.atlas.colour(
+                self.atlas.background, self.imageMode)
+            if self._image is None:
+                self._image = self._newImage(self.size, background)
+            elif old is not None:
+                self._image.paste(background, old)
+            if text:
+                self._image.paste(self.atlas.render(text), (x, y))
+            rects = [self._textBox(text, x, y)]
+            if old is not None:
+                rects.insert(0, old)
+        else:
+            rects = []
+            for i, (was, now) in enumerate(zip(self.text, text)):
+                if was == now:
+                    continue
+                left = x + i * cellWidth
+                self._image.paste(self.atlas.render(now), (left, y))
+                rects.append((left, y, left + cellWidth, y + cellHeight))
+        self.text = text
+        self._shownAt = (x, y, len(text))
+        rects = [rect for rect in map(self._clip, rects) if rect]
+        [self.markDirty(rect) for rect in rects]
+        return rects
+
+    def _textOrigin(self, text):
+        x, y = self.position(self.size, self.atlas.textSize(text))
+        return (int(x), int(y))
+
+    def _textBox(self, text, x, y):
+        width, height = self.atlas.textSize(text)
+        return (x, y, x + width, y + height)
+
+    def _clip(self, rect):
+        """rect, inside this layout, or None if none of it is."""
+        width, height = self.size
+        left, top = max(rect[0], 0), max(rect[1], 0)
+        right, bottom = min(rect[2], width), min(rect[3], height)
+        if left >= right or top >= bottom:
+            return None
+        return (left, top, right, bottom)
@@ -1,10 +1,17 @@
+from contextlib import contextmanager
+from os import path
 from PIL import Image, ImageDraw
 from random import randint
 import numpy
-from numpy import floor
+import zlib
 
 from .rotation import Rotation
-from .index_order import IndexOrder
+from .damage import Damage
+from .geometry import Geometry
+
+# The (x, y, width, height) of no children, shared by every childless layout.
+_NO_RECTS = numpy.zeros((0, 4), dtype=numpy.int32)
+_NO_RECTS.flags.writeable = False
 
 
 class Layout:
@@ -12,12 +19,58 @@ class Layout:
         Layout - a simple image layout manager for RPi Inky HATs.
     """
 
+    # Layouts have no __dict__ (subclasses still do, unless they declare
+    # __slots__ too), so that trees with thousands of layouts stay small.
+    __slots__ = (
+        'rotation', 'packingBias', 'rotation_degrees', 'topLeft',
+        'drawBorders', 'sharedFramebuffer', 'packingMode', 'size',
+        'imageMode', 'palette', 'borders', 'borderColour', 'children',
+        'redrawCount', 'rowBias', 'columnBias', 'gridCell', 'gridSpan',
+        '_spacers', '_paddings', '_rects', '_slotSize', '_slotSizeError',
+        '_image', '_imageHash', '_depth', '_id', '_resizeDeferrals',
+        '_resizePending', '_parent', '_dirty', '_dirtyRects',
+        '_dirtyChildren', '_predrawn', '_stats', '_damage', '_framebuffer',
+        '_chrome', '_paintedChrome', '_version', '_pastedVersion',
+        '__weakref__',
+    )
+
     DEFAULT_PALETTE = (255, 255, 255, 0, 0, 0, 255, 0, 0) + (0, 0, 0) * 252
+    # Palette indices of the Inky colours.
+    WHITE = 0
+    BLACK = 1
+    RED = 2
+    YELLOW = 2
+    # Lossless transposes that turn an image clockwise by each Rotation.
+    TRANSPOSES = {
+        Rotation.RIGHT: Image.ROTATE_270,
+        Rotation.DOWN: Image.ROTATE_180,
+        Rotation.LEFT: Image.ROTATE_90,
+    }
 
     @staticmethod
     def tupleReversed(tupleValue):
         return tuple(reversed(tupleValue))
 
+    @staticmethod
+    def _parseBorder(border):
+        """The (top, right, bottom, left) borders and colour of a border."""
+        if isinstance(border, int):
+            return (border, border, border, border), 2
+        elif isinstance(border, tuple):
+            borders, borderColour = border
+            if isinstance(borders, int):
+                return (borders, borders, borders, borders), borderColour
+            elif len(borders) == 2:
+                btb, blr = borders
+                return (btb, blr, btb, blr), borderColour
+            elif len(borders) == 4:
+                return borders, borderColour
+            else:
+                raise("Illegal borders format: {b}".format(b=borders))
+
+        elif not isinstance(border, None):
+            raise("borders is not an allowed type:{t}".format(t=type(border)))
+
     def __str__(self):
         return "{id}/{depth}/{pm}/{pb}/{children}:{tl}+{dim}".format(
             id=self._id,
@@ -35,9 +88,29 @@ class Layout:
                 tl=self._topLefts
         )
 
+    def __getstate__(self):
+        # A layout is pickled (e.g. sent to a process pool) without its
+        # parent; its children are re-attached to it when unpickled.
+        state = dict(getattr(self, '__dict__', {}))
+        state.update([
+            (name, getattr(self, name))
+            for cls in type(self).__mro__
+            for name in getattr(cls, '__slots__', ())
+            if name != '__weakref__' and hasattr(self, name)
+        ])
+        state['_parent'] = None
+        state['_stats'] = None
+        return state
+
+    def __setstate__(self, state):
+        [setattr(self, name, value) for name, value in state.items()]
+        for child in self.children:
+            child._parent = self
+
     def __init__(
         self, size=(250, 122), packingMode='h', border=(0, 0),
-        depth=0, rotation=Rotation.UP, packingBias=1, imageMode="RGB"
+        depth=0, rotation=Rotation.UP, packingBias=1, imageMode="RGB",
+        palette=None, rowBias=None, columnBias=None
     ):
         """
             Construct a new Layer.
@@ -48,7 +121,7 @@ class Layout:
                 A 2-tuple describing the size of the layer.
                 Default:(250,122), the size of an Inky-PHAT.
             packingMode: str
-                The packing mode: one of 'h' or 'v'.
+                The packing mode: one of 'h', 'v' or 'grid'.
             border: int|(0,0)
                 If an int, then the width, and the colour is assumed to be '2'.
                 If a 2-tuple, then the first part is the width, and the second
@@ -69,67 +142,149 @@ class Layout:
                 The image mode to use when creating a default image (when one
                 does not exist). Refer to
                 [Pillow image modes](https://pillow.readthedocs.io/en/latest/handbook/concepts.html#modes).
+                With "P", images are kept as palette indices from end to end:
+                borders are drawn with palette indices, children are added
+                in "P" mode too, and images set with `setImage` are matched
+                to the palette.
+            palette: tuple
+                The palette to use in "P" mode. Default: DEFAULT_PALETTE,
+                where 0 is white, 1 is black and 2 is red.
+            rowBias: tuple
+                For 'grid' packing: the bias of each row, like packingBias.
+                (1, 1, 2) makes three rows, the last twice as tall.
+            columnBias: tuple
+                For 'grid' packing: the bias of each column.
         """  # noqa: E501
         self.rotation = rotation
         self.packingBias = packingBias
         self.rotation_degrees = self.rotation.value * 90
         self.topLeft = (0, 0)
         self.drawBorders = True
+        self.sharedFramebuffer = False
         self.packingMode = packingMode
+        if packingMode == 'grid' and not (rowBias and columnBias):
+            raise ValueError("'grid' packing needs a rowBias and columnBias")
+        self.rowBias = tuple(rowBias) if rowBias else None
+        self.columnBias = tuple(columnBias) if columnBias else None
+        self.gridCell = None
+        self.gridSpan = (1, 1)
         self.size = size
         if self.rotation.value % 2:
             self.size = self.tupleReversed(self.size)
 
         self.imageMode = imageMode
+        self.palette = palette if palette else Layout.DEFAULT_PALETTE
 
-        if isinstance(border, int):
-            self.borders = (border, border, border, border)
-            self.borderColour = 2
-        elif isinstance(border, tuple):
-            borders, self.borderColour = border
-            if isinstance(borders, int):
-                self.borders = (borders, borders, borders, borders)
-            elif len(borders) == 2:
-                btb, blr = borders
-                self.borders = (btb, blr, btb, blr)
-            elif len(borders) == 4:
-                self.borders = borders
-            else:
-                raise("Illegal borders format: {b}".format(b=borders))
-
-        elif not isinstance(border, None):
-            raise("borders is not an allowed type:{t}".format(t=type(border)))
+        self.borders, self.borderColour = Layout._parseBorder(border)
 
         self.children = []
         self._spacers = []
         self._paddings = []
-        self._topLefts = []
-        self._slots = []
+        self._rects = _NO_RECTS
         self._slotSizeError = 0.0
         self._image = None
         self._depth = depth
         self._id = randint(1024, 8192)
+        self._resizeDeferrals = 0
+        self._resizePending = False
+        self._parent = None
+        self._dirty = True
+        self._dirtyRects = None
+        self._dirtyChildren = False
+        self._predrawn = False
+        self._stats = None
+        self._damage = []
+        self._framebuffer = None
+        self._chrome = None
+        self._paintedChrome = None
+        self._imageHash = None
+        self._version = 0
+        self._pastedVersion = None
+        self.redrawCount = 0
 
     def transformAsNeeded(self, twod):
-        if self.packingMode == 'v':
-            twod = self.tupleReversed(twod)
-        return twod
+        return Geometry.transform(self.packingMode, twod)
 
-    def setImage(self, image):
+    def setImage(self, image, skipUnchanged=False, copy=True):
         """
             Set the image on this layer after you've drawn it.
             The image you set will be cropped to the Layer's size before being
             set on it.
+            In "P" mode, images in other modes are converted to the layout's
+            palette; "P" images are assumed to use the same palette already.
+
+            Parameters
+            ----------
+            image: PIL.Image
+                The image.
+            skipUnchanged: bool
+                If True, and the image has the same content (by CRC-32 of its
+                pixels, mode and size) as the one set last time, nothing is
+                done: the layout isn't cropped or marked dirty, so it won't
+                be redrawn. Default: False.
+            copy: bool
+                If False, the layout takes the image itself rather than a
+                cropped copy of it, and will draw its border on it: don't
+                change or reuse the image after setting it. A larger image
+                is cropped when it is next drawn. Default: True.
         """
-        self._image = image.crop((0, 0) + self.size)
+        imageHash = None
+        if skipUnchanged:
+            imageHash = (tuple(self.size), Layout._contentHash(image))
+            if imageHash == self._imageHash:
+                return self._image
+        if copy:
+            image = image.crop((0, 0) + self.size)
+        self._image = self._toImageMode(image)
+        self.markDirty()
+        self._imageHash = imageHash
         return self._image
 
+    @staticmethod
+    def _contentHash(image):
+        crc = zlib.crc32(image.tobytes())
+        if image.mode == "P":
+            crc = zlib.crc32(bytes(image.getpalette() or ()), crc)
+        return (image.mode, image.size, crc)
+
+    def markDirty(self, rect=None):
+        """Mark this layout as needing to be redrawn.
+
+        `setImage`, `resize` and `addLayout` do this for you. Call it yourself
+        if you change the layout's image (or anything else that affects how
+        it is drawn) directly. All the ancestors are told that they have a
+        dirty descendant, so the next `draw()` redraws only what changed.
+
+        Parameters
+        ----------
+        rect: tuple
+            Optional. If only part of a childless layout's image changed,
+            the `(left, top, right, bottom)` box that changed, so that
+            `damage()` can report just that area. Default: the whole layout.
+        """
+        self._imageHash = None
+        if rect is None:
+            self._dirtyRects = None
+        elif not self._dirty:
+            self._dirtyRects = [tuple(rect)]
+        elif self._dirtyRects is not None:
+            self._dirtyRects.append(tuple(rect))
+        self._dirty = True
+        parent = self._parent
+        while parent is not None and not parent._dirtyChildren:
+            parent._dirtyChildren = True
+            parent = parent._parent
+
     def addLayer(
             self,
             border=0,
             packingBias=1,
             packingMode='h',
-            rotation=Rotation.UP
+            rotation=Rotation.UP,
+            rowBias=None,
+            columnBias=None,
+            cell=None,
+            span=(1, 1)
     ):
         """
             Add a new child layout to this layout as a layer.
@@ -140,6 +295,8 @@ class Layout:
                 the same as the constructor's border property.
             packingBias: int
                 the same as the constructor's packingBias property.
+            cell, span: tuple
+                the same as `addLayout`'s.
         """
 
         childLayer = Layout(
@@ -147,24 +304,120 @@ class Layout:
             border=border,
             packingBias=packingBias,
             packingMode=packingMode,
-            rotation=rotation
+            rotation=rotation,
+            imageMode=self.imageMode,
+            palette=self.palette,
+            rowBias=rowBias,
+            columnBias=columnBias
             )
-        return self.addLayout(childLayer)
+        return self.addLayout(childLayer, cell, span)
+
+    def addLayers(self, specs):
+        """
+            Add several new child layouts, resizing only once at the end.
 
-    def addLayout(self, layout):
+            Parameters
+            ------
+            specs: iterable
+                Each item is a dict of keyword arguments for `addLayer`,
+                e.g. `{'packingBias': 3}`. An empty dict adds a default layer.
+
+            Returns the list of new child layouts, in order.
+        """
+        with self.deferResize():
+            return [self.addLayer(**spec) for spec in specs]
+
+    @contextmanager
+    def deferResize(self):
+        """Defer resizing this layout's children until the block exits.
+
+        Use this when adding many layers at once: instead of resizing every
+        child after every `addLayer`/`addLayout`, the children are resized
+        once when the outermost `with` block exits. Sizes and top-lefts of
+        the children are not up to date inside the block.
+
+            with layout.deferResize():
+                for i in range(100):
+                    layout.addLayer()
+        """
+        self._resizeDeferrals += 1
+        try:
+            yield self
+        finally:
+            self._resizeDeferrals -= 1
+            if self._resizeDeferrals == 0 and self._resizePending:
+                self._resizePending = False
+                self._resizeChildren()
+
+    def addLayout(self, layout, cell=None, span=(1, 1)):
         """Add a pre-defined layout and resize it.
         This enables creating subclasses of Layout that can redraw themselves.
+
+        Parameters
+        ----------
+        cell: tuple
+            In a 'grid' layout, the (row, column) to put it in. Default: the
+            first free cell, in row-major order, that it fits in.
+        span: tuple
+            In a 'grid' layout, the (rows, columns) it spans. Default: (1, 1).
         """
+        if self.packingMode == 'grid':
+            layout.gridCell = Geometry.placeCell(
+                len(self.rowBias), len(self.columnBias),
+                [(child.gridCell, child.gridSpan) for child in self.children],
+                cell, span)
+            layout.gridSpan = tuple(span)
+        elif cell is not None or tuple(span) != (1, 1):
+            raise ValueError("Only 'grid' layouts have cells and spans")
+        layout._parent = self
+        if self._stats is not None:
+            layout.setStats(self._stats)
         self.children.append(layout)
+        self.markDirty()
         self._resizeChildren()
         return layout
 
     def resize(self, size):
-        self.size = size
-        if self._image:
-            self._image = self._image.crop((0, 0) + size)
+        self._setSize(size)
         self._resizeChildren()
 
+    def _setSize(self, size):
+        """Resize this layout (and crop its image), but not its children."""
+        with self._timed('resize'):
+            self.size = size
+            if self._image and self._image.size != tuple(size):
+                self._image = self._image.crop((0, 0) + size)
+        self.markDirty()
+
+    def _fitImage(self):
+        """Crop an image set with `setImage(copy=False)` to this layout."""
+        if self._image and self._image.size != tuple(self.size):
+            self._image = self._image.crop((0, 0) + tuple(self.size))
+
+    def setStats(self, stats):
+        """Record timings for this layout and all its descendants.
+
+        Parameters
+        ----------
+        stats: RenderStats
+            Where to record them, or None to stop recording.
+        """
+        self._stats = stats
+        [child.setStats(stats) for child in self.children]
+
+    @contextmanager
+    def _timed(self, phase):
+        """Record the time spent in the with block, when there are stats."""
+        if self._stats is None:
+            yield
+            return
+        stats = self._stats
+        start = stats.clock()
+        try:
+            yield
+        finally:
+            stats.record(self, phase, stats.clock() - start)
+
     def _childCount(self):
         return len(self.children)
 
@@ -178,77 +431,22 @@ class Layout:
         return self._childCount() > 1
 
     def _calcDrawableSize(self):
-        w, h = self.size
-        bt, br, bb, bl = self.borders
-        # Remove the borders
-        w = w - bl - br
-        h = h - bt - bb
-        _calcDrawableSize = (w, h)
-        return _calcDrawableSize
+        return Geometry.drawableSize(self.size, self.borders)
+
+    def _biases(self):
+        return [child.packingBias for child in self.children]
 
     def _calcSlotSize(self):
-        dw, dw1 = self.transformAsNeeded(self._calcDrawableSize())
-        sw = self._sumSpacersWidth()
-        w = dw - sw
-        if self._onlyOneChild():
-            return (w, dw1)
-        w = w * 1.0
-        slotCount = self._getChildSlotTotal()
-        if slotCount > 1:
-            w = w / slotCount
-        intW = int(floor(w))
-        self._slotSizeError = (w - intW) * slotCount
-        slotSize = (intW, dw1)
+        slotSize, slotSizeError = Geometry.slotSize(
+            self._calcDrawableSize(), self._spacers, self._biases(),
+            self.packingMode)
+        if not self._onlyOneChild():
+            self._slotSizeError = slotSizeError
         return slotSize
 
-    def _getSlotSizeFor(self, child):
-        """Get the slot size for this child.
-        Accounts for the packingBias in the slot size.
-        """
-        slotSize = self._slotSize
-        if self._moreThanOneChild():
-            slotSize = (slotSize[0] * child.packingBias, slotSize[1])
-        return self.transformAsNeeded(slotSize)
-
     def _calcPaddings(self):
         """The additional width to put into each spacer, to even things out."""
-        drawableWidth, dh = self.transformAsNeeded(self._calcDrawableSize())
-        drawableWidth = float(drawableWidth)
-        _errorWidth = int(floor(self._slotSizeError + 0.49))
-        _paddingCount = self._childCount() - 1
-        _paddings = [0] * _paddingCount
-        _indexes = IndexOrder.alternating(_paddingCount)
-        while _errorWidth > 0:
-            _errorWidth -= 1
-            _index = _errorWidth % _paddingCount
-            _paddings[_indexes[_index]] += 1
-        return _paddings
-
-    def _calcIdealSpacerWidth(self):
-        bt, br, bb, bl = self.borders
-        if self.packingMode == 'h':
-            return bl
-        else:  # self.packingMode == 'v'
-            return bt
-
-    def _calcRealSpacerWidth(self, index):
-        _optWidth = self._calcIdealSpacerWidth()
-        _padding = self._paddings[index]
-        return _optWidth + _padding
-
-    def _calcTopLeft(self, index):
-        slotStart = 0
-        if index > 0:
-            slotStart = self._getChildSlotStart(index)  # all previous ones
-        slotDelta = slotStart * self._slotSize[0]
-        topLeftBorders = (self.borders[0], self.borders[3])
-        spacer = 0  # 0 offset from drawable area, NOT parent area
-        if (index > 0):
-            spacer = sum(self._spacers[0:index])
-        top = spacer + slotDelta + topLeftBorders[0]
-        left = topLeftBorders[1]
-        topLeft = (top, left)
-        return self.transformAsNeeded(topLeft)
+        return Geometry.paddings(self._slotSizeError, self._childCount())
 
     def _sumSpacersWidth(self):
         """The total width of all the spacers."""
@@ -281,54 +479,68 @@ class Layout:
         return _sparePixels
 
     def _resizeChildren(self):
+        if self._resizeDeferrals > 0:
+            self._resizePending = True
+            return
         childCount = self._childCount()
 
         if childCount > 0:  # only update when there's children present
-
-            # spacers - first pass
-            self._spacers = [
-                    self._calcIdealSpacerWidth() for c in
-                    range(self._childCount() - 1)
-            ]
-
-            # calculate all the slots - slotSize needed for slots and topLefts.
-            self._slotSize = self._calcSlotSize()
-            self._slots = [
-                self._getSlotSizeFor(child)
-                for child
-                in self.children
-            ]
-            # outcome: Is there a slot error?
-            if self._slotSizeError > 0.5:
-                # next, calculate padding
-                self._paddings = self._calcPaddings()
-                # add padding to existing spacers
-                __spacers = [
-                    x[0] + x[1]
-                    for x
-                    in zip(self._spacers, self._paddings)
-                ]
-                # and reset the spacers with adjusted values
-                self._spacers = __spacers
-            # finally, toplefts depend on slots and adjusted spacers
-            self._topLefts = [
-                self._calcTopLeft(i) for i in range(self._childCount())
-            ]
-            self._showSparePixels()
+            with self._timed('resize'):
+                self._calcGeometry()
             [
-                self._resizeAChild(
-                    child,
-                    index
-                ) for index, child in enumerate(self.children)
+                self._resizeAChild(child, rect)
+                for child, rect in zip(self.children, self._rects.tolist())
             ]
 
-    def _resizeAChild(self, child, index):
+    def _calcGeometry(self):
+        """Calculate the spacers, slots and top-lefts of the children."""
+        if self.packingMode == 'grid':
+            self._setGeometry(Geometry.gridPack(
+                self.size, self.borders, self.rowBias, self.columnBias,
+                *self._gridCells()))
+            return
+        self._setGeometry(Geometry.pack(
+            self.size, self.borders, self.packingMode, self._biases()))
+        self._showSparePixels()
+
+    def _gridCells(self):
+        """The cells and spans of the children of a 'grid' layout."""
+        return (
+            [child.gridCell for child in self.children],
+            [child.gridSpan for child in self.children])
 
-        slotSize = self._slots[index]
-        topLeft = self._topLefts[index]
+    def _setGeometry(self, packing):
+        """Use a Packing (see `Geometry.pack`) for the children.
+
+        The children themselves aren't resized.
+        """
+        self._resizePending = False
+        self._chrome = None
+        self._spacers = list(packing.spacers)
+        self._slotSize = packing.slotSize
+        self._slotSizeError = packing.slotSizeError
+        if packing.paddings is not None:
+            self._paddings = list(packing.paddings)
+        self._rects = numpy.array([
+            tuple(topLeft) + tuple(slot)
+            for topLeft, slot in zip(packing.topLefts, packing.slots)
+        ], dtype=numpy.int32).reshape(-1, 4)
 
-        child.resize(slotSize)
-        child.topLeft = topLeft
+    @property
+    def _slots(self):
+        """The size of each child."""
+        return [tuple(rect) for rect in self._rects[:, 2:].tolist()]
+
+    @property
+    def _topLefts(self):
+        """The top-left of each child."""
+        return [tuple(rect) for rect in self._rects[:, :2].tolist()]
+
+    def _resizeAChild(self, child, rect):
+        """Resize and place a child in its (x, y, width, height) rect."""
+        x, y, w, h = rect
+        child.resize((w, h))
+        child.topLeft = (x, y)
 
     def _getChildSlotTotal(self):
         """The total number of slots."""
@@ -350,70 +562,484 @@ class Layout:
 
         Before this method is called (from the draw(self) method),
         a new image is created, and the children are drawn.
+        Layouts that override this method are redrawn on every draw().
         """
         return
 
-    def draw(self):
-        self._drawChildren()
+    def draw(self, executor=None):
+        """Draw this layout and its children, and return the image.
+
+        Only the layouts that have been marked dirty since they were last
+        drawn (see `markDirty`) are redrawn; the composited images of the
+        others are re-used. Afterwards, `redrawCount` holds the number of
+        layouts that were actually redrawn, including this one.
+
+        If `sharedFramebuffer` is set, the whole tree is composited into a
+        single framebuffer owned by this layout (see `_drawFramebuffer`).
+
+        Parameters
+        ----------
+        executor: concurrent.futures.Executor
+            Optional. If given, the childless layouts that need redrawing
+            (such as subclasses with an expensive drawOverride) are drawn
+            concurrently in it. Compositing still happens in order, so the
+            image is the same as without an executor. With a process pool,
+            only each layout's image is brought back from the worker.
+
+        Returns
+        -------
+        PIL.Image
+            For a layout with no rotation this is the layout's own image,
+            not a copy: copy it before changing it, or keeping it across
+            draws.
+        """
+        self._markDynamicDirty()
+        if executor is not None:
+            self._predrawLeaves(executor)
+        if self.sharedFramebuffer:
+            image = self._drawFramebuffer()
+        else:
+            self._render()
+            image = self._image
+
+        return self._rotate(image)
+
+    def _rotate(self, image):
+        """Return image rotated to the correct orientation.
+
+        Quarter turns are lossless transposes; UP returns image itself.
+        """
+        with self._timed('rotation'):
+            if self.rotation == Rotation.UP:
+                return image
+            return image.transpose(Layout.TRANSPOSES[self.rotation])
+
+    def damage(self):
+        """The areas that changed in the last draw().
+
+        Returns a list of `(left, top, right, bottom)` boxes (right and bottom
+        are exclusive), in the coordinates of the image returned by
+        `draw()`, i.e. with this layout's rotation applied. The list is
+        empty when nothing was redrawn. Use `Damage.coalesce` to merge
+        overlapping boxes before sending them to a display.
+        """
+        if not self.redrawCount:
+            return []
+        return Damage.rotate(self._damage, self.size, self.rotation)
+
+    def _newImage(self, size, colour):
+        """A new image in this layout's image mode (and palette)."""
+        image = Image.new(self.imageMode, size, colour)
+        if self.imageMode == "P":
+            image.putpalette(self.palette)
+        return image
+
+    def _toImageMode(self, image):
+        """Match the colours of image to the palette, in "P" mode."""
+        if self.imageMode != "P":
+            return image
+        return self._toPalette(image)
+
+    def _fromLayout(self, layout, image):
+        """image, from layout (e.g. a child), in this layout's image mode.
+
+        Images are only converted for a "P" layout, when they aren't "P"
+        images with the same palette: e.g. a layout added with addLayout
+        keeps its own image mode.
+        """
+        if self.imageMode != "P" or image.mode == "P" and (
+                layout.palette is self.palette or
+                tuple(layout.palette) == tuple(self.palette)):
+            return image
+        if image.mode == "P":
+            image = image.convert("RGB")
+        return self._toPalette(image)
+
+    def _root(self):
+        layout = self
+        while layout._parent is not None:
+            layout = layout._parent
+        return layout
+
+    def _toPalette(self, image):
+        """Image as indices of this layout's palette.
+
+        "P" images are assumed to use the palette already.
+        """
+        if image.mode == "P":
+            return image
+        paletteImage = Image.new("P", (1, 1), 0)
+        paletteImage.putpalette(self.palette)
+        return image.convert("RGB").quantize(palette=paletteImage, dither=0)
+
+    def _isDynamic(self):
+        """Whether this layout draws itself, with its own drawOverride."""
+        return type(self).drawOverride is not Layout.drawOverride
+
+    def _markDynamicDirty(self):
+        if self._isDynamic():
+            self.markDirty()
+        [child._markDynamicDirty() for child in self.children]
+
+    def _needsRender(self):
+        return self._dirty or self._dirtyChildren
+
+    def _render(self):
+        if not self._needsRender():
+            self.redrawCount = 0
+            return
+        self.redrawCount = 1
+        self._fitImage()
+        # when this layout's own image has changed, every child is re-pasted
+        redrawAll = not self._image or self._dirty and (
+            self._dirtyRects is None or self._hasChildren()
+        )
+        if redrawAll:
+            self._damage = [(0, 0) + tuple(self.size)]
+        elif self._dirty:
+            self._damage = list(self._dirtyRects)
+        else:
+            self._damage = []
+        self._drawChildren(redrawAll)
+        if self._predrawn:
+            self._predrawn = False
+        else:
+            self._drawSelf()
+
+        self._version += 1
+        self._dirty = False
+        self._dirtyRects = None
+        self._dirtyChildren = False
+
+    def _drawSelf(self):
+        """Draw this layout's own image, after its children are pasted."""
+        self._fitImage()
         if not self._image:
-            self._image = Image.new(self.imageMode, self.size, self._depth)
-        self.drawOverride()
+            self._image = self._newImage(self.size, self._depth)
+        with self._timed('drawOverride'):
+            self.drawOverride()
+
+        # draw the border, unless only the children (inside it) changed
+        if self.drawBorders:
+            with self._timed('border'):
+                self._drawBorder(
+                    self._image, force=self._dirty or self._isDynamic())
+        else:
+            self._paintedChrome = None
+
+    def _dirtyLeaves(self):
+        """Yield every childless layout that needs redrawing."""
+        if not self._needsRender():
+            return
+        if not self._hasChildren():
+            yield self
+        for child in self.children:
+            yield from child._dirtyLeaves()
+
+    def _predrawLeaves(self, executor):
+        """Draw the dirty childless layouts concurrently, in executor.
+
+        The rest of the drawing - and all of the compositing - then happens
+        in order, as usual, and uses these images.
+        """
+        leaves = list(self._dirtyLeaves())
+        images = executor.map(_drawDetached, leaves)
+        for leaf, image in zip(leaves, images):
+            leaf._image = image
+            leaf._predrawn = True
+
+    def _drawFramebuffer(self):
+        """Composite the whole tree straight into one shared framebuffer.
+
+        Layouts with children don't get images of their own: their
+        children are pasted into the framebuffer at their absolute offsets,
+        and their borders are drawn straight onto it, so each pixel is
+        copied once rather than once per ancestor. Childless layouts, and
+        layouts that override drawOverride, are drawn as usual and pasted.
+        A layout with children but no image of its own is filled with
+        colour 0 underneath them, as it is when it isn't shared.
+        """
+        fb = self._framebuffer
+        if fb is None or fb.size != tuple(self.size) or \
+                fb.mode != self.imageMode:
+            fb = self._newImage(self.size, 0)
+            self._framebuffer = fb
+            self.markDirty()
+        self._damage = self._renderShared(fb, (0, 0))
+        return fb
+
+    def _renderShared(self, fb, offset, redrawAll=False, clip=None):
+        """Draw into the shared framebuffer fb at offset.
+
+        Nothing is drawn outside clip, the (left, top, right, bottom) box
+        that this layout's ancestors share with it, just as a child pasted
+        onto its parent's own image is cut off at the edges.
+
+        Returns the damaged areas of the framebuffer.
+        """
+        x, y = offset
+        box = (x, y, x + self.size[0], y + self.size[1])
+        clip = Damage.intersection(box, clip or box) or (x, y, x, y)
+        if self._isDynamic() or not self._hasChildren():
+            self._render()
+            if redrawAll or self._pastedVersion != self._version:
+                with (self._parent or self)._timed('children'):
+                    self._pasteClipped(
+                        fb, self._root()._fromLayout(self, self._image), box,
+                        clip)
+                rects = self._damageSincePasted(redrawAll)
+                self._pastedVersion = self._version
+                rects = [
+                    Damage.intersection(Damage.offset(rect, offset), clip)
+                    for rect in rects
+                ]
+                return [rect for rect in rects if rect]
+            return []
 
-        # draw the border
-        draw = ImageDraw.Draw(self._image)
+        if not (redrawAll or self._needsRender()):
+            self.redrawCount = 0
+            return []
+        self.redrawCount = 1
+        redrawAll = redrawAll or self._dirty
+        damage = []
+        if redrawAll:
+            self._fitImage()
+            with self._timed('children'):
+                self._pasteClipped(
+                    fb, self._root()._fromLayout(self, self._image)
+                    if self._image else 0, box, clip)
+            if Damage.intersection(box, clip):
+                damage.append(Damage.intersection(box, clip))
+        for child in self.children:
+            childOffset = (x + child.topLeft[0], y + child.topLeft[1])
+            rects = child._renderShared(fb, childOffset, redrawAll, clip)
+            self.redrawCount += child.redrawCount
+            if not redrawAll:
+                damage.extend(rects)
         if self.drawBorders:
-            self._drawBorder(draw)
+            with self._timed('border'):
+                self._drawBorder(fb, offset, force=redrawAll, clip=clip)
+        else:
+            self._paintedChrome = None
+
+        self._dirty = False
+        self._dirtyRects = None
+        self._dirtyChildren = False
+        return damage
 
-        # return image rotated to the correct orientation
-        return self._image.rotate(-self.rotation_degrees, expand=1)
+    def _drawBorder(self, image, offset=(0, 0), force=True, clip=None):
+        """Paint the border and spacers onto image at offset.
 
-    def _drawBorder(self, draw):
-        w = self.borders[0]
+        Children are pasted inside the border and between the spacers, so
+        unless force is set, nothing is painted when the same border and
+        spacers were painted at the same offset last time - as long as no
+        child overlaps them. With clip, only what's inside that (left, top,
+        right, bottom) box is painted.
+        """
+        rects = self._chromeRects()
+        painted = (rects, self.borderColour, offset, clip)
+        if not force and self._paintedChrome == painted and \
+                not self._chrome[2]:
+            return
+        draw = ImageDraw.Draw(image)
         c = self.borderColour
-        while w > 0:
-            rectSize = tuple(numpy.subtract(self.size, w))
-            w = w - 1
-            draw.rectangle([(w, w), rectSize], outline=c, width=1)
-
-        def drawSpacer(w, tl):
-            if w > 0:
-                if self.packingMode == 'h':
-                    tlxy = [tl[0] - w, tl[1]]
-                    brxy = [tl[0] - 1, self.size[1] - tl[1]]
-                else:
-                    tlxy = [tl[0], tl[1] - w]
-                    brxy = [self.size[0] - tl[0], tl[1] - 1]
-                tlbr = tlxy + brxy
-                draw.rectangle(tlbr, fill=c, width=1)
-
-        if len(self._spacers) > 0:
-            [
-                drawSpacer(w, tl)
-                for w, tl
-                in zip([0] + self._spacers, self._topLefts)
-            ]
+        for rect in rects:
+            rect = Damage.offset(rect, offset)
+            if clip is not None:
+                # from inclusive to exclusive, and back again
+                rect = Damage.intersection(
+                    (rect[0], rect[1], rect[2] + 1, rect[3] + 1), clip)
+                if rect is None:
+                    continue
+                rect = (rect[0], rect[1], rect[2] - 1, rect[3] - 1)
+            draw.rectangle(rect, fill=c)
+        self._paintedChrome = painted
+
+    @staticmethod
+    def _pasteClipped(image, source, box, clip):
+        """Paste source (an image or a colour) into box on image, cut down
+        to clip."""
+        rect = Damage.intersection(box, clip)
+        if rect is None:
+            return
+        if rect == tuple(box) or not isinstance(source, Image.Image):
+            image.paste(source, rect)
+            return
+        image.paste(
+            source.crop(Damage.offset(rect, (-box[0], -box[1]))), rect[:2])
+
+    def _chromeRects(self):
+        """The border and spacer rectangles, cached until the next resize.
+
+        Rectangles are (x0, y0, x1, y1), inclusive, as ImageDraw uses them.
+        """
+        key = (tuple(self.size), self.borders, self.packingMode)
+        if self._chrome is None or self._chrome[0] != key:
+            rects = self._calcChromeRects()
+            # children pasted over the chrome mean it has to be repainted
+            self._chrome = (
+                key, rects, Geometry.overlapsChildren(rects, self._rects))
+        return self._chrome[1]
+
+    def _calcChromeRects(self):
+        if self.packingMode == 'grid':
+            return Geometry.frameRects(self.size, self.borders) + \
+                Geometry.gridGapRects(
+                    self.size, self.borders, self.rowBias, self.columnBias,
+                    *self._gridCells())
+        return Geometry.frameRects(self.size, self.borders) + \
+            Geometry.spacerRects(
+                self.size, self.packingMode, self._spacers, self._topLefts)
 
-    def _drawChildren(self):
-        [child.draw() for child in self.children]
-        [
-            self._drawChildOnParent(child, index)
-            for index, child
-            in enumerate(self.children)
-        ]
+    def _drawChildren(self, redrawAll=True):
+        for index, child in enumerate(self.children):
+            if child._needsRender():
+                child._render()
+                self.redrawCount += child.redrawCount
+            else:
+                child.redrawCount = 0
+            if redrawAll or child._pastedVersion != child._version:
+                if not redrawAll:
+                    self._damage.extend([
+                        Damage.offset(rect, child.topLeft)
+                        for rect in child._damageSincePasted()
+                    ])
+                self._drawChildOnParent(child, index)
+
+    def _damageSincePasted(self, redrawAll=False):
+        """The areas of this layout's image changed since it was pasted."""
+        if (
+            not redrawAll and
+            self._pastedVersion is not None and
+            self._version == self._pastedVersion + 1
+        ):
+            return self._damage
+        # redrawn more than once since it was pasted
+        return [(0, 0) + tuple(self.size)]
 
     def _drawChildOnParent(self, child, index):
         if not child._image:
             print("WARNING: NO IMAGE ON THIS CHILD", child)
         else:
-            if not self._image:
-                self._image = self.setImage(child._image.copy())
-            else:
-                self._image.paste(child._image, child.topLeft)
+            with self._timed('children'):
+                if not self._image:
+                    # with no image of its own, a layout starts blank, so
+                    # that whatever its children don't cover never changes
+                    self._image = self._newImage(self.size, 0)
+                self._image.paste(
+                    self._fromLayout(child, child._image), child.topLeft)
+            child._pastedVersion = child._version
 
-    def write(self, fp):
-        self.draw().convert(mode="RGB").save(fp)
-        if self.children:
-            [
-                child.write(fp.replace(".", "-{i}.".format(i=index)))
-                for index, child in enumerate(self.children)
-            ]
+    def toPanelBuffer(self):
+        """Draw this layout, and pack it into bit planes for an Inky display.
+
+        The image is matched to the palette (if it isn't a "P" image
+        already) and packed, row by row and most significant bit first,
+        into the two 1-bit-per-pixel planes that the Inky controllers take:
+
+        * black/white: 0 where the pixel is BLACK, 1 elsewhere.
+        * colour: 1 where the pixel is RED (or YELLOW), 0 elsewhere.
+
+        Palette indices past RED count as whichever of WHITE, BLACK and RED
+        has the nearest colour in the palette, e.g. the indices of deeper
+        layouts' default images are black in DEFAULT_PALETTE.
+
+        Returns the two planes as a tuple of bytes.
+        """
+        image = self.draw()
+        with self._timed('export'):
+            pixels = self._inkyColours()[numpy.array(self._toPalette(image))]
+            return (
+                numpy.packbits(pixels != Layout.BLACK).tobytes(),
+                numpy.packbits(pixels == Layout.RED).tobytes()
+            )
+
+    def _inkyColours(self):
+        """WHITE, BLACK or RED for each of the 256 palette indices."""
+        palette = numpy.zeros(768, dtype=int)
+        values = list(self.palette)[:768]
+        palette[:len(values)] = values
+        colours = palette.reshape(256, 3)
+        inky = [Layout.WHITE, Layout.BLACK, Layout.RED]
+        distances = (
+            (colours[:, numpy.newaxis] - colours[inky]) ** 2).sum(axis=2)
+        nearest = numpy.array(inky, dtype=numpy.uint8)[
+            distances.argmin(axis=1)]
+        nearest[inky] = inky
+        return nearest
+
+    def write(self, fp, mode="RGB", depths=None):
+        """Draw this layout, and write it (and its children) to files.
+
+        The tree is drawn once. The children's images are then taken from
+        what was already composited, rather than drawing each one again.
+
+        Parameters
+        ----------
+        fp: str
+            The file name for this layout. Each child's file name adds
+            "-<index>" to its parent's, before the extension, e.g.
+            "out/display.png", "out/display-0.png", "out/display-0-1.png".
+        mode: str
+            The image mode to convert to before saving. Default: "RGB".
+            Use None to save in the layout's own image mode, e.g. a "P"
+            layout is saved as a palette image, without expanding it to
+            24 bits per pixel.
+        depths: iterable
+            Which levels of children to write as well, counting this
+            layout's children as 1, their children as 2, and so on.
+            Default: None, which writes every descendant. Use () to write
+            just this layout.
+        """
+        self._writeImage(self.draw(), fp, mode)
+        if depths is not None:
+            depths = set(depths)
+            if not depths:
+                return
+        for child, childFp, offset, level in self._descendants(fp):
+            if depths is None or level in depths:
+                image = self._compositedImage(child, offset)
+                child._writeImage(child._rotate(image), childFp, mode)
+
+    def _writeImage(self, image, fp, mode):
+        with self._timed('export'):
+            if mode:
+                image = image.convert(mode=mode)
+            image.save(fp)
+
+    @staticmethod
+    def _childPath(fp, index):
+        root, ext = path.splitext(fp)
+        return "{root}-{i}{ext}".format(root=root, i=index, ext=ext)
+
+    def _descendants(self, fp, offset=(0, 0), level=1):
+        """Yield (child, fp, offset, level) for every descendant.
+
+        The offset is the child's top-left in this layout's image.
+        """
+        for index, child in enumerate(self.children):
+            childFp = self._childPath(fp, index)
+            childOffset = (
+                offset[0] + child.topLeft[0], offset[1] + child.topLeft[1])
+            yield child, childFp, childOffset, level
+            yield from child._descendants(childFp, childOffset, level + 1)
+
+    def _compositedImage(self, descendant, offset):
+        """The image of a descendant, as composited by the last draw()."""
+        if (
+            self.sharedFramebuffer and descendant._hasChildren() and
+            not descendant._isDynamic()
+        ):
+            w, h = descendant.size
+            box = (offset[0], offset[1], offset[0] + w, offset[1] + h)
+            return self._framebuffer.crop(box)
+        return descendant._image
+
+
+def _drawDetached(layout):
+    """Draw a childless layout's own image, and return it.
+
+    This is a module function so that process pools can pickle it.
+    """
+    layout._drawSelf()
+    return layout._image
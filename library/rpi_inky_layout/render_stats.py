@@ -0,0 +1,95 @@
+from threading import Lock
+from time import perf_counter
+
+
+class RenderStats:
+    """
+        RenderStats - where the time goes when laying out and drawing.
+
+        Attach an instance to a Layout tree with `Layout.setStats(stats)`.
+        Each layout then records the time it spends in each phase:
+
+        * resize: calculating its children's geometry, and cropping images.
+        * drawOverride: its own drawOverride method.
+        * children: pasting its children's images into its own.
+        * border: drawing its border and spacers.
+        * rotation: rotating the drawn image.
+        * export: converting and saving images, or packing panel buffers.
+
+        Times are "self" times: a layout's time doesn't include the time of
+        its children. Override `record` if you want a callback for every
+        timing as well.
+    """
+
+    PHASES = (
+        'resize', 'drawOverride', 'children', 'border', 'rotation', 'export'
+    )
+
+    def __init__(self, clock=perf_counter):
+        self.clock = clock
+        self._records = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def frameName(layout):
+        """The name of a layout in a stack: class#id@depth."""
+        return "{cls}#{id}@{depth}".format(
+            cls=type(layout).__name__, id=layout._id, depth=layout._depth)
+
+    @staticmethod
+    def stackOf(layout):
+        """The names of the layout and its ancestors, from the top down."""
+        stack = []
+        while layout is not None:
+            stack.append(RenderStats.frameName(layout))
+            layout = layout._parent
+        return tuple(reversed(stack))
+
+    def record(self, layout, phase, seconds):
+        """Add seconds to the time layout has spent in phase."""
+        key = (self.stackOf(layout), layout._id, layout._depth, phase)
+        with self._lock:
+            calls, total = self._records.get(key, (0, 0.0))
+            self._records[key] = (calls + 1, total + seconds)
+
+    def reset(self):
+        with self._lock:
+            self._records = {}
+
+    def total(self, phase=None):
+        """The total seconds recorded, for one phase or for all of them."""
+        return sum([
+            seconds
+            for (stack, nodeId, depth, p), (calls, seconds)
+            in self._records.items()
+            if phase is None or p == phase
+        ])
+
+    def summary(self):
+        """A list of (id, depth, phase, calls, seconds), slowest first."""
+        rows = [
+            (nodeId, depth, phase, calls, seconds)
+            for (stack, nodeId, depth, phase), (calls, seconds)
+            in self._records.items()
+        ]
+        return sorted(rows, key=lambda row: row[4], reverse=True)
+
+    def folded(self):
+        """The timings as folded stacks, in microseconds.
+
+        Each line is the layout's stack from the top down, then the phase,
+        separated by semicolons, followed by the time: the format that
+        flamegraph.pl and speedscope read.
+        """
+        lines = [
+            "{stack};{phase} {us}".format(
+                stack=";".join(stack), phase=phase,
+                us=int(round(seconds * 1e6)))
+            for (stack, nodeId, depth, phase), (calls, seconds)
+            in sorted(self._records.items())
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def writeFolded(self, fp):
+        with open(fp, "w") as f:
+            f.write(self.folded())
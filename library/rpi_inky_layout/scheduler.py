@@ -0,0 +1,143 @@
+import asyncio
+import inspect
+
+
+class RefreshScheduler:
+    """
+        RefreshScheduler - update the panels of a Layout tree on their own
+        timers, with asyncio, and refresh the display as few times as possible.
+
+        Each layout is registered with an async producer and an interval. The
+        producer is called with the layout every interval seconds, and
+        returns either a new image for it (which is set with
+        `setImage(image, skipUnchanged=True)`), or None if it has changed the
+        layout some other way, e.g. the state that a `drawOverride` subclass
+        draws from.
+
+        Updates that land within `debounce` seconds of the first one are
+        coalesced: the root is drawn once, and `sink(image, damage)` is
+        called once, with a copy of the image and the `damage()` of that
+        draw, so the sink can keep the image. The sink isn't called when
+        nothing was redrawn. It can be a plain function or a coroutine
+        function.
+
+        For example:
+
+            scheduler = RefreshScheduler(topLayout, showOnPanel, debounce=1)
+            scheduler.register(clock, drawClock, 60)
+            scheduler.register(weather, fetchWeather, 15 * 60)
+            loop.run_until_complete(scheduler.run())
+    """
+
+    def __init__(self, root, sink, debounce=0.5, executor=None):
+        self.root = root
+        self.sink = sink
+        self.debounce = debounce
+        self.executor = executor
+        self.refreshCount = 0
+        self._registrations = []
+        self._flushTask = None
+        self._flushTasks = set()
+        self._stopped = None
+        self._error = None
+
+    def register(self, layout, producer, interval):
+        """Call producer(layout) every interval seconds, from `run()`.
+
+        Parameters
+        ----------
+        layout: Layout
+            A layout in the root's tree, usually one without children.
+        producer: coroutine function
+            Called with layout; returns a PIL.Image for it, or None.
+        interval: float
+            The seconds between the starts of two calls. The first call is
+            made as soon as `run()` starts.
+        """
+        if interval <= 0:
+            raise ValueError("The interval must be positive: {i}".format(
+                i=interval))
+        self._registrations.append((layout, producer, interval))
+
+    async def run(self):
+        """Run the producers until `stop()` is called, or one of them (or the
+        sink) raises.
+
+        Updates still waiting for their debounce window are drawn and sent
+        to the sink before this returns, and refreshes already under way
+        are finished, so nothing reaches the sink after it returns.
+        """
+        self._stopped = asyncio.Event()
+        self._error = None
+        tasks = [
+            asyncio.ensure_future(self._produce(*registration))
+            for registration in self._registrations
+        ]
+        stopper = asyncio.ensure_future(self._stopped.wait())
+        try:
+            done, pending = await asyncio.wait(
+                tasks + [stopper], return_when=asyncio.FIRST_COMPLETED)
+            [task.result() for task in done if task is not stopper]
+        finally:
+            for task in tasks + [stopper]:
+                task.cancel()
+            await asyncio.gather(
+                *tasks + [stopper], return_exceptions=True)
+            waiting = self._flushTask
+            self._flushTask = None
+            if waiting is not None:
+                waiting.cancel()
+            await asyncio.gather(*self._flushTasks, return_exceptions=True)
+            if waiting is not None:
+                await self.refresh()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        """Make `run()` return, after it has sent any pending updates."""
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def update(self):
+        """Note that the tree has changed, and refresh it after debounce."""
+        if self._flushTask is None:
+            self._flushTask = asyncio.ensure_future(self._flushLater())
+            # kept until it's done, so run() can wait for it
+            self._flushTasks.add(self._flushTask)
+            self._flushTask.add_done_callback(self._flushTasks.discard)
+
+    async def refresh(self):
+        """Draw the root now, and send it to the sink if anything changed."""
+        image = self.root.draw(self.executor)
+        if not self.root.redrawCount:
+            return
+        self.refreshCount += 1
+        # the root draws into the same image every time
+        result = self.sink(image.copy(), self.root.damage())
+        if inspect.isawaitable(result):
+            await result
+
+    async def _flushLater(self):
+        await asyncio.sleep(self.debounce)
+        self._flushTask = None
+        try:
+            await self.refresh()
+        except Exception as e:
+            # nothing awaits this task, so run() raises it instead
+            self._error = e
+            self.stop()
+
+    async def _produce(self, layout, producer, interval):
+        loop = asyncio.get_event_loop()
+        due = loop.time()
+        while True:
+            image = await producer(layout)
+            if image is None:
+                layout.markDirty()
+            else:
+                layout.setImage(image, skipUnchanged=True)
+            if layout._dirty:
+                self.update()
+            # keep to the interval, however long the producer took
+            due += interval
+            await asyncio.sleep(max(0, due - loop.time()))
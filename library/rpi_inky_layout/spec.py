@@ -0,0 +1,242 @@
+from collections import namedtuple
+
+from .damage import Damage
+from .geometry import Geometry, Packing
+from .layout import Layout
+from .rotation import Rotation
+
+PlanNode = namedtuple('PlanNode', [
+    'name', 'rect', 'size', 'topLeft', 'rotation', 'packingMode',
+    'packingBias', 'borders', 'borderColour', 'spacerRects', 'packing',
+    'children'
+])
+PlanNode.__doc__ = """One layout in a compiled plan. Everything is immutable.
+
+    name: the spec's name, or None.
+    rect: the (left, top, right, bottom) box of the layout in the top-level
+        layout (right and bottom exclusive), before rotation.
+    size: the size of the layout.
+    topLeft: its top-left, relative to its parent.
+    rotation: its Rotation.
+    packingMode, packingBias, borders, borderColour: as in Layout.
+    spacerRects: the spacers between its children (the uncovered gaps,
+        in a grid), as rectangles for ImageDraw in the top-level layout
+        (right and bottom inclusive).
+    packing: the Packing of its children, or None if it has none.
+    children: the PlanNodes of its children.
+"""
+
+
+class LayoutSpec():
+    """
+        LayoutSpec - declarative layouts, compiled in one pass.
+
+        A spec is a nested dict (e.g. loaded from JSON) describing a layout
+        and its children:
+
+            {
+                "size": [250, 122],
+                "rotation": "RIGHT",
+                "border": 1,
+                "children": [
+                    {"name": "clock", "packingBias": 2},
+                    {"packingMode": "v", "children": [{}, {}]}
+                ]
+            }
+
+        Each layout may have a `name`, `packingMode`, `border`,
+        `packingBias`, `rotation` (a Rotation, its name or its value) and
+        `children`; 'grid' layouts have a `rowBias` and `columnBias`, and
+        their children may have a `cell` and `span`. Only the top-level
+        layout has a `size`. The defaults
+        are the same as the `Layout` constructor's for the top-level layout,
+        and `addLayer`'s for the others.
+    """
+
+    KEYS = (
+        'name', 'size', 'packingMode', 'border', 'packingBias', 'rotation',
+        'children', 'rowBias', 'columnBias', 'cell', 'span'
+    )
+
+    @staticmethod
+    def compile(spec):
+        """Compile a spec into a plan: a tree of PlanNodes.
+
+        The numbers are the same as building the tree with `addLayer`.
+        """
+        LayoutSpec._check(spec, True)
+        rotation = LayoutSpec._rotation(spec.get('rotation', Rotation.UP))
+        size = tuple(spec.get('size', (250, 122)))
+        if rotation.value % 2:
+            size = Layout.tupleReversed(size)
+        return LayoutSpec._compileNode(spec, size, (0, 0), (0, 0), (0, 0))
+
+    @staticmethod
+    def build(spec, plan=None):
+        """Build a Layout tree from a spec, without any resizing.
+
+        Parameters
+        ----------
+        spec: dict
+            The spec.
+        plan: PlanNode
+            Optional. The spec's compiled plan, if you have it already.
+
+        Returns the top-level Layout.
+        """
+        if plan is None:
+            plan = LayoutSpec.compile(spec)
+        layout = Layout(
+            size=tuple(spec.get('size', (250, 122))),
+            **LayoutSpec._layoutArgs(spec, (0, 0)))
+        LayoutSpec._buildChildren(layout, spec, plan)
+        return layout
+
+    @staticmethod
+    def apply(plan, layout):
+        """Size and place an existing Layout tree as the plan says.
+
+        The tree must have the same shape, packing modes, borders and
+        packing biases as the plan's spec. Nothing is recalculated.
+        """
+        LayoutSpec._checkMatches(plan, layout)
+        layout._setSize(plan.size)
+        LayoutSpec._applyChildren(plan, layout)
+
+    @staticmethod
+    def _check(spec, isTop):
+        unknown = [key for key in spec if key not in LayoutSpec.KEYS]
+        if unknown:
+            raise ValueError("Unknown layout spec keys: {k}".format(
+                k=", ".join(unknown)))
+        if not isTop and 'size' in spec:
+            raise ValueError("Only the top-level layout spec has a size")
+        [LayoutSpec._check(child, False) for child in spec.get('children', [])]
+
+    @staticmethod
+    def _rotation(rotation):
+        if isinstance(rotation, Rotation):
+            return rotation
+        if isinstance(rotation, str):
+            return Rotation[rotation]
+        return Rotation(rotation)
+
+    @staticmethod
+    def _tuples(value):
+        """JSON lists to tuples, all the way down."""
+        if isinstance(value, list):
+            return tuple([LayoutSpec._tuples(v) for v in value])
+        return value
+
+    @staticmethod
+    def _border(spec, default):
+        return LayoutSpec._tuples(spec.get('border', default))
+
+    @staticmethod
+    def _layoutArgs(spec, defaultBorder):
+        return {
+            'packingMode': spec.get('packingMode', 'h'),
+            'border': LayoutSpec._border(spec, defaultBorder),
+            'packingBias': spec.get('packingBias', 1),
+            'rotation': LayoutSpec._rotation(
+                spec.get('rotation', Rotation.UP)),
+            'rowBias': spec.get('rowBias'),
+            'columnBias': spec.get('columnBias'),
+        }
+
+    @staticmethod
+    def _compileNode(spec, size, topLeft, origin, defaultBorder):
+        args = LayoutSpec._layoutArgs(spec, defaultBorder)
+        borders, borderColour = Layout._parseBorder(args['border'])
+        childSpecs = spec.get('children', [])
+        packing = None
+        children = ()
+        spacerRects = ()
+        if childSpecs and args['packingMode'] == 'grid':
+            cells, spans = LayoutSpec._gridCells(args, childSpecs)
+            packing = Geometry.gridPack(
+                size, borders, args['rowBias'], args['columnBias'], cells,
+                spans)
+            chromeRects = Geometry.gridGapRects(
+                size, borders, args['rowBias'], args['columnBias'], cells,
+                spans)
+        elif childSpecs:
+            packing = Geometry.pack(
+                size, borders, args['packingMode'],
+                [child.get('packingBias', 1) for child in childSpecs])
+            chromeRects = Geometry.spacerRects(
+                size, args['packingMode'], packing.spacers, packing.topLefts)
+        if childSpecs:
+            packing = Packing(
+                tuple(packing.spacers), packing.slotSize,
+                packing.slotSizeError, tuple(packing.slots),
+                tuple(packing.paddings)
+                if packing.paddings is not None else None,
+                tuple(packing.topLefts))
+            children = tuple([
+                LayoutSpec._compileNode(
+                    child, slot, tl, (origin[0] + tl[0], origin[1] + tl[1]),
+                    0)
+                for child, slot, tl
+                in zip(childSpecs, packing.slots, packing.topLefts)
+            ])
+            spacerRects = tuple([
+                Damage.offset(rect, origin) for rect in chromeRects
+            ])
+        return PlanNode(
+            spec.get('name'),
+            (origin[0], origin[1], origin[0] + size[0], origin[1] + size[1]),
+            size, topLeft, args['rotation'], args['packingMode'],
+            args['packingBias'], borders, borderColour, spacerRects, packing,
+            children)
+
+    @staticmethod
+    def _gridCells(args, childSpecs):
+        """Place the children in the grid, as addLayout does."""
+        placed = []
+        for child in childSpecs:
+            span = tuple(child.get('span', (1, 1)))
+            placed.append((Geometry.placeCell(
+                len(args['rowBias']), len(args['columnBias']), placed,
+                child.get('cell'), span), span))
+        return [cell for cell, span in placed], [span for cell, span in placed]
+
+    @staticmethod
+    def _buildChildren(layout, spec, plan):
+        with layout.deferResize():
+            for childSpec, childPlan in zip(
+                    spec.get('children', []), plan.children):
+                child = layout.addLayer(
+                    cell=childSpec.get('cell'),
+                    span=tuple(childSpec.get('span', (1, 1))),
+                    **LayoutSpec._layoutArgs(childSpec, 0))
+                child._setSize(childPlan.size)
+                child.topLeft = childPlan.topLeft
+                LayoutSpec._buildChildren(child, childSpec, childPlan)
+            if plan.packing is not None:
+                layout._setGeometry(plan.packing)
+
+    @staticmethod
+    def _checkMatches(plan, layout):
+        if (
+            len(plan.children) != len(layout.children) or
+            plan.packingMode != layout.packingMode or
+            tuple(plan.borders) != tuple(layout.borders) or
+            plan.packingBias != layout.packingBias
+        ):
+            raise ValueError(
+                "The plan doesn't match the layout: {p} {l}".format(
+                    p=plan.name, l=layout))
+        [
+            LayoutSpec._checkMatches(childPlan, child)
+            for childPlan, child in zip(plan.children, layout.children)
+        ]
+
+    @staticmethod
+    def _applyChildren(plan, layout):
+        for childPlan, child in zip(plan.children, layout.children):
+            child._setSize(childPlan.size)
+            child.topLeft = childPlan.topLeft
+            LayoutSpec._applyChildren(childPlan, child)
+        if plan.packing is not None:
+            layout._setGeometry(plan.packing)
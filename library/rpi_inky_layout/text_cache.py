@@ -0,0 +1,200 @@
+from collections import OrderedDict, namedtuple
+from PIL import Image, ImageDraw
+
+from .damage import Damage
+from .position import Position
+
+TextRun = namedtuple('TextRun', ['mask', 'offset', 'advance'])
+TextRun.__doc__ = """A rasterised run of text.
+
+    mask: the text's pixels, as an "L" (anti-aliased) or "1" image, cropped
+        to its bounding box.
+    offset: where the mask goes, relative to where the text is drawn.
+    advance: how far the next run starts after this one.
+"""
+
+
+class TextCache:
+    """
+        TextCache - rasterise each run of text once, and paste it after that.
+
+        Runs are cached by font, text and mask mode, up to `maxEntries` runs
+        and `maxBytes` of masks; the least recently used runs are dropped
+        first. The colour isn't part of the key: the fill is pasted through
+        the run's mask, so one cached run serves every colour.
+
+        Use it from `drawOverride`, or wherever you draw your images:
+
+            cache = TextCache()
+            ...
+            box = cache.drawAt(self._image, time, font, fill=Layout.BLACK)
+            self.markDirty(box)
+
+        With `glyphs=True`, each character is cached (and placed by its
+        advance) on its own, so when a clock ticks over only the new digits
+        are rasterised. The characters aren't kerned, and any pixels a
+        bitmap font draws outside a character's own box are lost, so this
+        suits digits and monospaced fonts.
+    """
+
+    def __init__(self, maxEntries=512, maxBytes=1 << 20):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.byteCount = 0
+        self.hits = 0
+        self.misses = 0
+        self._runs = OrderedDict()
+
+    def __len__(self):
+        return len(self._runs)
+
+    def clear(self):
+        self._runs.clear()
+        self.byteCount = 0
+
+    @staticmethod
+    def textBox(font, text):
+        """The (left, top, right, bottom) of text drawn at (0, 0) in font.
+
+        Uses `font.getbbox`, or `font.getsize` with Pillow before 8.0.
+        """
+        if hasattr(font, 'getbbox'):
+            return tuple(font.getbbox(text))
+        width, height = font.getsize(text)
+        return (0, 0, width, height)
+
+    @staticmethod
+    def textLength(font, text):
+        """How far text advances, in font.
+
+        Uses `font.getlength`, or `font.getsize` with Pillow before 8.0.
+        """
+        if hasattr(font, 'getlength'):
+            return font.getlength(text)
+        return font.getsize(text)[0]
+
+    @staticmethod
+    def maskMode(image):
+        """"1" for images that can't blend colours ("1" and "P"), else "L".
+
+        This matches the font mode that ImageDraw uses for the image.
+        """
+        return "1" if image.mode in ("1", "P", "I", "F") else "L"
+
+    @staticmethod
+    def fontKey(font):
+        """Fonts loaded from the same file at the same size share runs."""
+        path = getattr(font, 'path', None)
+        if path is None or not isinstance(path, str):
+            return font
+        return (path, font.size, getattr(font, 'index', 0))
+
+    def run(self, text, font, mode="L"):
+        """The TextRun for text in font, rasterising it if it isn't cached."""
+        key = (self.fontKey(font), text, mode)
+        run = self._runs.get(key)
+        if run is not None:
+            self.hits += 1
+            self._runs.move_to_end(key)
+            return run
+        self.misses += 1
+        run = self._rasterise(text, font, mode)
+        self._runs[key] = run
+        self.byteCount += self._byteCount(run)
+        self._evict()
+        return run
+
+    def measure(self, text, font, mode="L", glyphs=False):
+        """The (left, top, right, bottom) of text, relative to where it's
+        drawn, as `draw` would draw it."""
+        box = None
+        x = 0
+        for run in self._runsOf(text, font, mode, glyphs):
+            runBox = self._runBox(run, x, 0)
+            if runBox is not None:
+                box = runBox if box is None else Damage.union(box, runBox)
+            x += run.advance
+        return box or (0, 0, 0, 0)
+
+    def draw(self, image, xy, text, font, fill, glyphs=False):
+        """Draw text on image at xy, as `ImageDraw.text(xy, text, fill, font)`
+        would.
+
+        Returns the (left, top, right, bottom) box that was drawn on (for
+        `markDirty`), or None if nothing was.
+        """
+        mode = self.maskMode(image)
+        x, y = xy
+        box = None
+        for run in self._runsOf(text, font, mode, glyphs):
+            runBox = self._runBox(run, x, y)
+            if runBox is not None:
+                image.paste(fill, runBox, run.mask)
+                box = runBox if box is None else Damage.union(box, runBox)
+            x += run.advance
+        return box
+
+    def drawAt(
+            self, image, text, font, fill, position=Position.middle_centre,
+            box=None, glyphs=False):
+        """Draw text on image, placed in box by a `Position` function.
+
+        Parameters
+        ----------
+        position: function
+            A `Position` function, e.g. `Position.middle_centre`.
+        box: tuple
+            The (left, top, right, bottom) to place the text in. Default:
+            the whole image.
+
+        Returns the box that was drawn on, as `draw` does.
+        """
+        if box is None:
+            box = (0, 0) + image.size
+        left, top, right, bottom = self.measure(
+            text, font, self.maskMode(image), glyphs)
+        x, y = position(
+            (box[2] - box[0], box[3] - box[1]), (right - left, bottom - top))
+        return self.draw(
+            image, (int(box[0] + x - left), int(box[1] + y - top)), text,
+            font, fill, glyphs)
+
+    def _runsOf(self, text, font, mode, glyphs):
+        if not glyphs:
+            return [self.run(text, font, mode)]
+        return [self.run(character, font, mode) for character in text]
+
+    @staticmethod
+    def _rasterise(text, font, mode):
+        left, top, right, bottom = TextCache.textBox(font, text)
+        mask = Image.new(mode, (max(0, right - left), max(0, bottom - top)), 0)
+        if mask.size[0] and mask.size[1]:
+            draw = ImageDraw.Draw(mask)
+            draw.fontmode = mode
+            draw.text((-left, -top), text, fill=255, font=font)
+        return TextRun(mask, (left, top), TextCache.textLength(font, text))
+
+    @staticmethod
+    def _runBox(run, x, y):
+        width, height = run.mask.size
+        if not width or not height:
+            return None
+        left = int(x + run.offset[0])
+        top = int(y + run.offset[1])
+        return (left, top, left + width, top + height)
+
+    @staticmethod
+    def _byteCount(run):
+        width, height = run.mask.size
+        if run.mask.mode == "1":
+            return (width + 7) // 8 * height
+        return width * height
+
+    def _evict(self):
+        """Drop the least recently used runs, down to the limits."""
+        while len(self._runs) > 1 and (
+            len(self._runs) > self.maxEntries or
+            self.byteCount > self.maxBytes
+        ):
+            key, run = self._runs.popitem(last=False)
+            self.byteCount -= self._byteCount(run)
@@ -0,0 +1,131 @@
+from PIL import Image
+import unittest
+
+from rpi_inky_layout import Damage, Layout, Rotation
+
+
+class TestDamage(unittest.TestCase):
+
+    def testCoalesceOverlapping(self):
+        rects = [(0, 0, 10, 10), (5, 5, 20, 20), (30, 0, 40, 10)]
+        self.assertEqual(
+            [(0, 0, 20, 20), (30, 0, 40, 10)], Damage.coalesce(rects))
+
+    def testCoalesceChained(self):
+        rects = [(0, 0, 10, 10), (20, 0, 30, 10), (8, 0, 22, 10)]
+        self.assertEqual([(0, 0, 30, 10)], Damage.coalesce(rects))
+
+    def testCoalesceTouching(self):
+        rects = [(0, 0, 10, 10), (10, 0, 20, 10)]
+        self.assertEqual(rects, Damage.coalesce(rects))
+        self.assertEqual([(0, 0, 20, 10)], Damage.coalesce(rects, gap=1))
+
+    def testArea(self):
+        self.assertEqual(0, Damage.area([]))
+        self.assertEqual(150, Damage.area([(0, 0, 10, 10), (0, 0, 5, 10)]))
+
+    def testRotateMatchesImageRotation(self):
+        size = (40, 20)
+        rect = (3, 5, 11, 8)
+        img = Image.new("L", size, 0)
+        img.paste(255, rect)
+        for rotation in Rotation:
+            rotated = img.rotate(-rotation.value * 90, expand=1)
+            self.assertEqual(
+                [rotated.getbbox()],
+                Damage.rotate([rect], size, rotation),
+                rotation.name
+            )
+
+
+class TestLayoutDamage(unittest.TestCase):
+
+    @staticmethod
+    def buildTree(rotation=Rotation.UP):
+        layout = Layout((200, 100), border=1, rotation=rotation)
+        left = layout.addLayer(packingMode='v')
+        right = layout.addLayer()
+        leaves = [left.addLayer(), left.addLayer()]
+        [
+            leaf.setImage(Image.new("RGB", leaf.size, 0x0000ff))
+            for leaf in leaves
+        ]
+        right.setImage(Image.new("RGB", right.size, 0x00ff00))
+        return layout, leaves + [right]
+
+    def testFirstDrawDamagesEverything(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        self.assertEqual([(0, 0, 200, 100)], layout.damage())
+
+    def testNothingChangedNoDamage(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        layout.draw()
+        self.assertEqual([], layout.damage())
+
+    def testDamageIsTheChangedLeaf(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        leaf = leaves[1]
+        leaf.setImage(Image.new("RGB", leaf.size, 0xff0000))
+        layout.draw()
+        parent = layout.children[0]
+        x = parent.topLeft[0] + leaf.topLeft[0]
+        y = parent.topLeft[1] + leaf.topLeft[1]
+        self.assertEqual(
+            [(x, y, x + leaf.size[0], y + leaf.size[1])], layout.damage())
+
+    def testDamageIsRotated(self):
+        for rotation in Rotation:
+            layout, leaves = self.buildTree(rotation)
+            before = layout.draw().copy()
+            leaf = leaves[2]
+            leaf.setImage(Image.new("RGB", leaf.size, 0xff0000))
+            after = layout.draw()
+            # damage covers exactly the pixels that differ
+            changed = Image.new("L", after.size, 0)
+            [changed.paste(255, rect) for rect in layout.damage()]
+            diff = Image.frombytes("L", after.size, bytes([
+                255 if a != b else 0
+                for a, b in zip(before.getdata(), after.getdata())
+            ]))
+            self.assertEqual(diff.getbbox(), changed.getbbox(), rotation)
+
+    def testPartialDamage(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        leaf = leaves[2]
+        leaf._image.paste(0xff0000, (2, 3, 7, 9))
+        leaf.markDirty((2, 3, 7, 9))
+        layout.draw()
+        self.assertEqual(
+            [Damage.offset((2, 3, 7, 9), leaf.topLeft)], layout.damage())
+
+    def testDamageCoversEveryChangedPixel(self):
+        layout = Layout((300, 200), border=1)
+        leaves = [layout.addLayer(), layout.addLayer()]
+        [
+            leaf.setImage(Image.new("RGB", leaf.size, 0x0000ff * (i + 1)))
+            for i, leaf in enumerate(leaves)
+        ]
+        before = layout.draw().copy()
+        w, h = leaves[0].size
+        rect = (1, 1, w // 2, h // 2)
+        leaves[0]._image.paste(0xff0000, rect)
+        leaves[0].markDirty(rect)
+        after = layout.draw()
+        changed = Image.new("L", after.size, 0)
+        [changed.paste(255, box) for box in layout.damage()]
+        diff = Image.frombytes("L", after.size, bytes([
+            255 if a != b and not c else 0
+            for a, b, c in zip(
+                before.getdata(), after.getdata(), changed.getdata())
+        ]))
+        self.assertIsNone(diff.getbbox())
+        self.assertEqual(
+            [Damage.offset(rect, leaves[0].topLeft)], layout.damage())
+
+
+if __name__ == '__main__':
+    unittest.main()
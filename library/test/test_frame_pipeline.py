@@ -0,0 +1,78 @@
+from PIL import Image
+import unittest
+
+from rpi_inky_layout import FramePipeline, Layout
+
+
+class TestFramePipeline(unittest.TestCase):
+
+    class FakeClock:
+
+        def __init__(self):
+            self.now = 100.0
+
+        def __call__(self):
+            return self.now
+
+    def setUp(self):
+        self.clock = self.FakeClock()
+        self.frames = []
+        self.layout = Layout((200, 100))
+        self.big = self.layout.addLayer(packingBias=3)
+        self.small = self.layout.addLayer()
+        self.layout.draw()
+        self.pipeline = FramePipeline(
+            self.layout, self.frames.append, minInterval=10,
+            clock=self.clock)
+
+    def setColour(self, layout, colour):
+        layout.setImage(Image.new("RGB", layout.size, colour))
+        self.pipeline.notify()
+
+    def testNothingIsSentWithoutChanges(self):
+        self.assertIsNone(self.pipeline.poll())
+        # notified, but nothing was redrawn
+        self.pipeline.notify()
+        self.assertIsNone(self.pipeline.poll())
+        self.assertEqual([], self.frames)
+
+    def testOnlyTheLatestCompositeIsSent(self):
+        self.setColour(self.small, (0xff, 0, 0))
+        frame = self.pipeline.poll()
+        self.assertEqual([frame], self.frames)
+        self.assertFalse(frame.full)
+        self.assertEqual([(150, 0, 200, 100)], frame.boxes)
+        for colour in ((0, 0xff, 0), (0, 0, 0xff), (0, 0xff, 0xff)):
+            self.clock.now += 3
+            self.setColour(self.small, colour)
+            self.assertIsNone(self.pipeline.poll())
+        self.assertEqual(1, self.pipeline.wait())
+        self.clock.now += 1
+        frame = self.pipeline.poll()
+        self.assertEqual(2, self.pipeline.frameCount)
+        self.assertEqual((0, 0xff, 0xff), frame.image.getpixel((199, 0)))
+        self.assertIsNone(self.pipeline.poll())
+        # the frames that were sent keep their own pixels
+        self.assertEqual(
+            (0xff, 0, 0), self.frames[0].image.getpixel((199, 0)))
+
+    def testForceIgnoresTheInterval(self):
+        self.setColour(self.small, 0)
+        self.pipeline.poll()
+        self.setColour(self.small, 1)
+        self.assertIsNone(self.pipeline.poll())
+        self.assertIsNotNone(self.pipeline.poll(force=True))
+
+    def testFullRefreshAboveTheAreaThreshold(self):
+        self.setColour(self.big, (0xff, 0, 0))
+        frame = self.pipeline.poll()
+        self.assertTrue(frame.full)
+        self.assertEqual([(0, 0, 200, 100)], frame.boxes)
+        self.pipeline.fullRefreshArea = 0.8
+        self.clock.now += 10
+        self.setColour(self.big, (0, 0xff, 0))
+        self.assertFalse(self.pipeline.poll().full)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import tempfile
+from PIL import Image, ImageSequence
+import unittest
+
+from rpi_inky_layout import (
+    FrameWriter, GifFrameWriter, Layout, RawFrameWriter)
+
+
+class TestFrameWriter(unittest.TestCase):
+
+    COLOURS = [(0xff, 0, 0), (0, 0, 0), (0, 0, 0), (0xff, 0xff, 0xff)]
+
+    def frames(self, imageMode="RGB"):
+        """The drawn frames, as the right-hand layer changes colour."""
+        layout = Layout((100, 50), border=1, imageMode=imageMode)
+        left, right = layout.addLayer(), layout.addLayer()
+        left.setImage(Image.new("RGB", left.size, (0xff, 0xff, 0xff)))
+        for colour in self.COLOURS:
+            right.setImage(Image.new("RGB", right.size, colour))
+            yield layout.draw()
+
+    def testOnlyChangedBoxesAreStored(self):
+        writer = GifFrameWriter(io.BytesIO())
+        boxes = [writer.add(frame) for frame in self.frames()]
+        self.assertEqual(
+            [(0, 0, 100, 50), (51, 1, 99, 49), None, (51, 1, 99, 49)], boxes)
+        self.assertEqual((48, 48), writer._pending[0].size)
+        writer.close()
+        self.assertEqual(3, writer.frameCount)
+
+    def testGif(self):
+        fp = io.BytesIO()
+        with GifFrameWriter(fp, duration=40) as writer:
+            [writer.add(frame) for frame in self.frames()]
+        fp.seek(0)
+        gif = Image.open(fp)
+        self.assertEqual(0, gif.info['loop'])
+        self.assertEqual(
+            [(40, (0xff, 0, 0)), (80, (0, 0, 0)), (40, (0xff, 0xff, 0xff))],
+            [
+                (frame.info['duration'], frame.convert("RGB").getpixel(
+                    (90, 10)))
+                for frame in ImageSequence.Iterator(gif)
+            ])
+        self.assertEqual(
+            (0xff, 0xff, 0xff), gif.convert("RGB").getpixel((10, 10)))
+
+    def testPaletteModeFramesKeepTheirPalette(self):
+        fp = io.BytesIO()
+        with GifFrameWriter(fp) as writer:
+            for frame in self.frames("P"):
+                writer.add(frame)
+                last = frame.copy()
+        fp.seek(0)
+        gif = Image.open(fp)
+        gif.seek(2)
+        self.assertEqual(
+            last.convert("RGB").tobytes(), gif.convert("RGB").tobytes())
+
+    def testRawRoundTrip(self):
+        for imageMode in ("RGB", "P"):
+            fp = io.BytesIO()
+            expected = []
+            with RawFrameWriter(fp, duration=10) as writer:
+                for frame in self.frames(imageMode):
+                    if writer.add(frame) is not None:
+                        expected.append(frame.tobytes())
+            fp.seek(0)
+            frames = [
+                (image.mode, image.tobytes(), duration)
+                for image, duration in RawFrameWriter.frames(fp)
+            ]
+            self.assertEqual(
+                [
+                    (imageMode, expected[0], 10),
+                    (imageMode, expected[1], 20),
+                    (imageMode, expected[2], 10)
+                ],
+                frames)
+
+    def testFileNameAndSizeMismatch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "preview.gif")
+            with GifFrameWriter(path) as writer:
+                writer.add(Image.new("RGB", (10, 10)))
+                with self.assertRaises(ValueError):
+                    writer.add(Image.new("RGB", (10, 11)))
+            self.assertEqual(1, Image.open(path).n_frames)
+
+    def testFrameWriterIsAbstract(self):
+        with self.assertRaises(TypeError):
+            FrameWriter(io.BytesIO())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rpi_inky_layout import GeometryCache, LayoutSpec, Rotation
+from . import test_layout_spec
+
+
+class TestGeometryCache(unittest.TestCase):
+
+    SPEC = test_layout_spec.TestLayoutSpec.SPEC
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = GeometryCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testRoundTrip(self):
+        for rotation in Rotation:
+            spec = dict(self.SPEC, rotation=rotation.name)
+            plan = LayoutSpec.compile(spec)
+            self.assertEqual(
+                plan, GeometryCache.decode(
+                    spec, GeometryCache.encode(spec, plan)))
+
+    def testCompileStoresThenLoads(self):
+        self.assertIsNone(self.cache.load(self.SPEC))
+        plan = self.cache.compile(self.SPEC)
+        self.assertTrue(os.path.exists(self.cache.path(self.SPEC)))
+        with mock.patch.object(LayoutSpec, 'compile') as compile:
+            self.assertEqual(plan, self.cache.compile(self.SPEC))
+            compile.assert_not_called()
+
+    def testBuildFromCache(self):
+        self.cache.compile(self.SPEC)
+        layout = self.cache.build(self.SPEC)
+        expected = LayoutSpec.build(self.SPEC)
+        self.assertEqual(expected.draw().tobytes(), layout.draw().tobytes())
+
+    def testHashIsStable(self):
+        reordered = dict(reversed(list(self.SPEC.items())))
+        self.assertEqual(
+            GeometryCache.specHash(self.SPEC),
+            GeometryCache.specHash(reordered))
+        self.assertNotEqual(
+            GeometryCache.specHash(self.SPEC),
+            GeometryCache.specHash(dict(self.SPEC, size=[250, 123])))
+
+    def testOtherLibraryVersionIsAMiss(self):
+        self.cache.compile(self.SPEC)
+        with mock.patch.object(
+                GeometryCache, 'libraryVersion', return_value='0.0.1'):
+            self.assertIsNone(self.cache.load(self.SPEC))
+
+    def testBadFilesAreRecalculated(self):
+        plan = self.cache.compile(self.SPEC)
+        path = self.cache.path(self.SPEC)
+        with open(path, 'rb') as f:
+            data = f.read()
+        for bad in (b'', data[:20], data[:-4], b'XXXX' + data[4:]):
+            with open(path, 'wb') as f:
+                f.write(bad)
+            self.assertIsNone(self.cache.load(self.SPEC))
+            self.assertEqual(plan, self.cache.compile(self.SPEC))
+        self.assertEqual([os.path.basename(path)], os.listdir(
+            self.directory.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+from PIL import Image, ImageDraw, ImageFont
+import numpy
+import unittest
+
+from rpi_inky_layout import (
+    GlyphAtlas, GlyphLayout, Layout, LayoutSpec, Position)
+
+
+class TestGlyphAtlas(unittest.TestCase):
+
+    FONT = ImageFont.load_default()
+
+    def setUp(self):
+        self.atlas = GlyphAtlas(self.FONT)
+
+    def buildTree(self, text="12:34"):
+        layout = Layout((200, 60), border=1)
+        layout.addLayer()
+        glyphs = layout.addLayout(GlyphLayout(self.atlas, text))
+        layout.draw()
+        return layout, glyphs
+
+    def testComposeMatchesImageDraw(self):
+        self.assertEqual((6, 11), self.atlas.cellSize)
+        self.assertEqual((6 * 16, 11), self.atlas.image.size)
+        expected = Image.new("P", (30, 11), Layout.WHITE)
+        ImageDraw.Draw(expected).text(
+            (0, 0), "12:34", fill=Layout.BLACK, font=self.FONT)
+        numpy.testing.assert_array_equal(
+            numpy.asarray(expected), self.atlas.compose("12:34"))
+        image = self.atlas.render("12:34")
+        self.assertEqual(("P", (30, 11)), (image.mode, image.size))
+        with self.assertRaises(ValueError):
+            self.atlas.compose("12:3a")
+
+    def testOnlyChangedCellsAreRedrawn(self):
+        layout, glyphs = self.buildTree()
+        self.assertEqual((34, 23, 5), glyphs._shownAt)
+        self.assertEqual([(58, 23, 64, 34)], glyphs.setText("12:35"))
+        layout.draw()
+        self.assertEqual(2, layout.redrawCount)
+        # in the parent's coordinates
+        self.assertEqual([(159, 24, 165, 35)], layout.damage())
+        self.assertEqual([], glyphs.setText("12:35"))
+        expected = self.buildTree("12:35")[0].draw()
+        self.assertEqual(expected.tobytes(), layout.draw().tobytes())
+
+    def testMovedTextIsCleared(self):
+        layout, glyphs = self.buildTree()
+        self.assertEqual(
+            [(34, 23, 64, 34), (37, 23, 61, 34)], glyphs.setText("9:59"))
+        expected = self.buildTree("9:59")[0].draw()
+        self.assertEqual(expected.tobytes(), layout.draw().tobytes())
+        with self.assertRaises(ValueError):
+            glyphs.setText("9:5x")
+        self.assertEqual("9:59", glyphs.text)
+
+    def testSizeFromASpec(self):
+        layout, glyphs = self.buildTree()
+        spec = {"size": [300, 60], "border": 1, "children": [{}, {}]}
+        LayoutSpec.apply(LayoutSpec.compile(spec), layout)
+        self.assertEqual((148, 58), glyphs.size)
+        self.assertEqual((59, 23, 5), glyphs._shownAt)
+        expected, expectedGlyphs = self.buildTree()
+        expected.resize((300, 60))
+        self.assertEqual(
+            expected.draw().tobytes(), layout.draw().tobytes())
+
+    def testResizeAndPosition(self):
+        layout, glyphs = self.buildTree()
+        layout.resize((300, 60))
+        self.assertEqual((148, 58), glyphs.size)
+        self.assertEqual((59, 23, 5), glyphs._shownAt)
+        glyphs = GlyphLayout(
+            self.atlas, "-1.5%", position=Position.top_left, size=(40, 20),
+            imageMode="RGB")
+        image = glyphs.draw()
+        self.assertEqual("RGB", image.mode)
+        self.assertEqual((0xff, 0xff, 0xff), image.getpixel((39, 19)))
+        self.assertEqual(
+            self.atlas.render("-1.5%").convert("RGB").tobytes(),
+            image.crop((0, 0, 30, 11)).tobytes())
+        self.assertEqual(
+            [(0, 0, 6, 11), (6, 0, 12, 11), (18, 0, 24, 11)],
+            glyphs.setText("+2.0%"))
+        glyphs.position = Position.bottom_right
+        glyphs.setText("7")
+        image = glyphs.draw()
+        self.assertEqual((0xff, 0xff, 0xff), image.getpixel((0, 0)))
+        self.assertEqual(
+            self.atlas.render("7").convert("RGB").tobytes(),
+            image.crop((34, 9, 40, 20)).tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
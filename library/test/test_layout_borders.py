@@ -0,0 +1,160 @@
+from PIL import Image, ImageDraw
+import unittest
+
+from rpi_inky_layout import Layout
+
+
+class TestLayoutBorders(unittest.TestCase):
+
+    @staticmethod
+    def drawOutlines(layout):
+        """Draw the border one outline at a time, as it used to be drawn."""
+        image = Image.new("RGB", layout.size, 0)
+        draw = ImageDraw.Draw(image)
+        width, height = layout.size
+        for w in range(layout.borders[0]):
+            draw.rectangle(
+                [(w, w), (width - w - 1, height - w - 1)],
+                outline=layout.borderColour, width=1)
+        return image
+
+    def testThickBorderMatchesOutlines(self):
+        for border in (1, 2, 5):
+            layout = Layout((60, 40), border=border)
+            layout.setImage(Image.new("RGB", layout.size, 0))
+            self.assertEqual(
+                self.drawOutlines(layout).tobytes(),
+                layout.draw().tobytes(), border)
+
+    def testSpacersFillTheGaps(self):
+        for packingMode in ('h', 'v'):
+            layout = Layout((61, 41), packingMode=packingMode, border=2)
+            [
+                child.setImage(Image.new("RGB", child.size, 0xffffff))
+                for child in [layout.addLayer() for i in range(3)]
+            ]
+            image = layout.draw()
+            index = 0 if packingMode == 'h' else 1
+            for w, tl in zip(layout._spacers, layout._topLefts[1:]):
+                xy = list(tl)
+                for gap in range(1, w + 1):
+                    xy[index] = tl[index] - gap
+                    self.assertEqual(
+                        (layout.borderColour, 0, 0), image.getpixel(tuple(xy)))
+
+    def testChromeIsCachedUntilResize(self):
+        layout = Layout((60, 40), border=2)
+        layout.addLayer()
+        layout.addLayer()
+        rects = layout._chromeRects()
+        self.assertIs(rects, layout._chromeRects())
+        layout.resize((80, 40))
+        resized = layout._chromeRects()
+        self.assertIsNot(rects, resized)
+        self.assertIn((78, 0, 79, 39), resized)
+
+    @staticmethod
+    def buildTree(packingMode, border, shared):
+        layout = Layout((250, 122), packingMode=packingMode, border=border)
+        layout.sharedFramebuffer = shared
+        layout.setImage(Image.new("RGB", layout.size, 0x000000))
+        inner = layout.addLayer(border=border, packingBias=2)
+        inner.setImage(Image.new("RGB", inner.size, 0x00ff00))
+        leaves = [inner.addLayer(border=1) for i in range(3)]
+        leaves.append(layout.addLayer())
+        [
+            leaf.setImage(Image.new("RGB", leaf.size, 0x203040 * (i + 1)))
+            for i, leaf in enumerate(leaves)
+        ]
+        return layout, leaves
+
+    def testIncrementalRedrawKeepsChrome(self):
+        for packingMode in ('h', 'v'):
+            for border in (
+                0, 1, 3, ((1, 5), 2), ((4, 1), 2), ((1, 2, 3, 4), 2)
+            ):
+                for shared in (False, True):
+                    layout, leaves = self.buildTree(
+                        packingMode, border, shared)
+                    layout.draw()
+                    for leaf in leaves:
+                        leaf.setImage(Image.new("RGB", leaf.size, 0xff0000))
+                        image = layout.draw()
+                    expected, leaves = self.buildTree(
+                        packingMode, border, shared)
+                    [
+                        leaf.setImage(Image.new("RGB", leaf.size, 0xff0000))
+                        for leaf in leaves
+                    ]
+                    self.assertEqual(
+                        expected.draw().tobytes(), image.tobytes(),
+                        (packingMode, border, shared))
+
+    def testChildrenOverlappingTheFrameRepaintIt(self):
+        for border in (((1, 5), 2), ((4, 1), 2), ((1, 2, 3, 4), 2)):
+            for shared in (False, True):
+                layout = Layout((100, 60), border=border)
+                layout.sharedFramebuffer = shared
+                leaves = [layout.addLayer(), layout.addLayer()]
+                [
+                    leaf.setImage(Image.new("RGB", leaf.size, 0x00ff00))
+                    for leaf in leaves
+                ]
+                layout.draw()
+                leaves[0].setImage(Image.new("RGB", leaves[0].size, 0xff))
+                image = layout.draw()
+                expected = Layout((100, 60), border=border)
+                expected.sharedFramebuffer = shared
+                [
+                    expected.addLayer().setImage(leaf._image)
+                    for leaf in leaves
+                ]
+                self.assertEqual(
+                    expected.draw().tobytes(), image.tobytes(),
+                    (border, shared))
+
+    def testNestedChildrenOverlappingTheFrameRepaintIt(self):
+        def buildNested(shared, borders):
+            layout = Layout((60, 40), border=borders[0])
+            layout.sharedFramebuffer = shared
+            parent = layout
+            for border in borders[1:]:
+                parent = parent.addLayer(border=border)
+            parent.addLayer()
+            return layout, parent.children[0]
+
+        for borders in (
+            (1, ((1, 3), 1), ((2, 1), 1)),
+            (((1, 4), 1), ((3, 1), 1), 0, ((1, 2, 3, 4), 1)),
+            (2, ((4, 1), 2), ((1, 5), 2)),
+        ):
+            for shared in (False, True):
+                layout, leaf = buildNested(shared, borders)
+                before = layout.draw().copy()
+                leaf.setImage(Image.new("RGB", leaf.size, 0x00ff00))
+                image = layout.draw()
+                expected, expectedLeaf = buildNested(shared, borders)
+                expectedLeaf.setImage(leaf._image)
+                self.assertEqual(
+                    expected.draw().tobytes(), image.tobytes(),
+                    (borders, shared))
+                # and nothing changed outside the damage
+                for left, top, right, bottom in layout.damage():
+                    before.paste(
+                        image.crop((left, top, right, bottom)), (left, top))
+                self.assertEqual(
+                    before.tobytes(), image.tobytes(), (borders, shared))
+
+    def testChromeNotRepaintedWhenOnlyChildrenChange(self):
+        layout, leaves = self.buildTree('h', 2, False)
+        layout.draw()
+        # scribble on the border behind the layout's back
+        layout._image.putpixel((0, 0), (1, 2, 3))
+        leaves[0].setImage(Image.new("RGB", leaves[0].size, 0xff0000))
+        self.assertEqual((1, 2, 3), layout.draw().getpixel((0, 0)))
+        layout.markDirty()
+        self.assertEqual((2, 0, 0), layout.draw().getpixel((0, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
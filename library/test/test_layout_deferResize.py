@@ -0,0 +1,87 @@
+import unittest
+
+from rpi_inky_layout import Layout
+from . import layout_fixtures as fixtures
+
+
+class TestLayoutDeferResize(unittest.TestCase):
+
+    @staticmethod
+    def geometry(layout):
+        return (
+            layout.size,
+            layout.topLeft,
+            layout._slots,
+            layout._spacers,
+            layout._topLefts,
+            [TestLayoutDeferResize.geometry(c) for c in layout.children]
+        )
+
+    def assertSameGeometry(self, expected, actual):
+        self.assertEqual(self.geometry(expected), self.geometry(actual))
+
+    def testDeferResizeMatchesIncremental(self):
+        for count in (1, 2, 3, 7, 13):
+            expected = fixtures.layoutWithLayers((600, 100), count, border=1)
+            layout = Layout((600, 100), border=1)
+            with layout.deferResize():
+                [layout.addLayer() for i in range(count)]
+            self.assertSameGeometry(expected, layout)
+
+    def testDeferResizeMatchesIncrementalVertical(self):
+        expected = fixtures.layoutWithLayers(
+            (100, 301), 6, border=2, packingMode='v')
+        layout = Layout((100, 301), packingMode='v', border=2)
+        with layout.deferResize():
+            [layout.addLayer() for i in range(6)]
+        self.assertSameGeometry(expected, layout)
+
+    def testDeferResizeDelaysResize(self):
+        layout = Layout((200, 100))
+        with layout.deferResize():
+            layer1 = layout.addLayer()
+            layer2 = layout.addLayer()
+            self.assertEqual((250, 122), layer1.size)
+            self.assertEqual([], layout._slots)
+        self.assertEqual((100, 100), layer1.size)
+        self.assertEqual((100, 100), layer2.size)
+        self.assertEqual((100, 0), layer2.topLeft)
+
+    def testNestedDeferResize(self):
+        layout = Layout((200, 100))
+        with layout.deferResize():
+            with layout.deferResize():
+                layer1 = layout.addLayer()
+            self.assertEqual((250, 122), layer1.size)
+        self.assertEqual((200, 100), layer1.size)
+
+    def testDeferResizeWithGrandchildren(self):
+        expected = Layout((400, 200), border=1)
+        expected1 = expected.addLayer(packingBias=3, packingMode='v')
+        expected.addLayer()
+        expected1.addLayer()
+        expected1.addLayer()
+
+        layout = Layout((400, 200), border=1)
+        with layout.deferResize():
+            layer1 = layout.addLayer(packingBias=3, packingMode='v')
+            layout.addLayer()
+            layer1.addLayer()
+            layer1.addLayer()
+        self.assertSameGeometry(expected, layout)
+
+    def testAddLayers(self):
+        expected = Layout((200, 10))
+        expected.addLayer(packingBias=3)
+        expected.addLayer()
+
+        layout = Layout((200, 10))
+        layers = layout.addLayers([{'packingBias': 3}, {}])
+        self.assertEqual(layout.children, layers)
+        self.assertEqual((150, 10), layers[0].size)
+        self.assertEqual((50, 10), layers[1].size)
+        self.assertSameGeometry(expected, layout)
+
+
+if __name__ == '__main__':
+    unittest.main()
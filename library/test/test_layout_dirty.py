@@ -0,0 +1,129 @@
+from PIL import Image, ImageDraw
+import unittest
+
+from rpi_inky_layout import Layout
+
+
+class CountingLayout(Layout):
+
+    def __init__(self):
+        super().__init__()
+        self.drawCount = 0
+
+    def drawOverride(self):
+        self.drawCount += 1
+
+
+class TestLayoutDirty(unittest.TestCase):
+
+    @staticmethod
+    def setImage(layout, colour, text):
+        img = Image.new("RGB", layout.size, colour)
+        draw = ImageDraw.Draw(img)
+        draw.text((0, 0), text)
+        layout.setImage(img)
+
+    def buildTree(self):
+        layout = Layout((250, 122), border=1)
+        left = layout.addLayer(packingMode='v')
+        right = layout.addLayer(packingMode='v')
+        leaves = [left.addLayer(), left.addLayer(), right.addLayer()]
+        [
+            self.setImage(leaf, 0x102030 * (i + 1), "leaf %d" % i)
+            for i, leaf in enumerate(leaves)
+        ]
+        return layout, leaves
+
+    def testFirstDrawRedrawsEverything(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        self.assertEqual(6, layout.redrawCount)
+
+    def testCleanDrawRedrawsNothing(self):
+        layout, leaves = self.buildTree()
+        first = layout.draw()
+        second = layout.draw()
+        self.assertEqual(0, layout.redrawCount)
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+    def testSetImageRedrawsOnlyAncestors(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        self.setImage(leaves[2], 0xff0000, "changed")
+        incremental = layout.draw()
+        self.assertEqual(3, layout.redrawCount)
+        self.assertEqual(0, layout.children[0].redrawCount)
+
+        expected, expectedLeaves = self.buildTree()
+        self.setImage(expectedLeaves[2], 0xff0000, "changed")
+        self.assertEqual(
+            expected.draw().tobytes(), incremental.tobytes())
+
+    def testParentsWithoutImagesMatchAFullRedraw(self):
+        for border in (0, 1, 3):
+            layout = Layout((250, 122), border=border)
+            leaves = [layout.addLayer(), layout.addLayer()]
+            self.setImage(leaves[0], 0x102030, "first")
+            self.setImage(leaves[1], 0x405060, "second")
+            layout.draw()
+            self.setImage(leaves[0], 0x708090, "changed")
+            incremental = layout.draw()
+            # the first child is at its topLeft, on every draw
+            x, y = leaves[0].topLeft
+            w, h = leaves[0].size
+            self.assertEqual(
+                leaves[0]._image.tobytes(),
+                incremental.crop((x, y, x + w, y + h)).tobytes(), border)
+            expected = Layout((250, 122), border=border)
+            [expected.addLayer() for leaf in leaves]
+            [
+                child.setImage(leaf._image)
+                for child, leaf in zip(expected.children, leaves)
+            ]
+            self.assertEqual(
+                expected.draw().tobytes(), incremental.tobytes(), border)
+            # and what the children don't cover is the same as when shared
+            expected.sharedFramebuffer = True
+            self.assertEqual(
+                expected.draw().tobytes(), incremental.tobytes(), border)
+
+    def testMarkDirtyPropagatesToAncestors(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        leaves[0].markDirty()
+        self.assertTrue(layout._dirtyChildren)
+        self.assertTrue(layout.children[0]._dirtyChildren)
+        self.assertFalse(layout.children[1]._dirtyChildren)
+        self.assertFalse(layout._dirty)
+
+    def testChildDrawnDirectlyIsStillPasted(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        self.setImage(leaves[0], 0x00ff00, "direct")
+        leaves[0].draw()
+        parent = layout.children[0]
+        point = (
+            parent.topLeft[0] + leaves[0].size[0] - 2,
+            parent.topLeft[1] + leaves[0].size[1] - 2
+        )
+        self.assertEqual((0, 255, 0), layout.draw().getpixel(point))
+
+    def testAddLayoutRedraws(self):
+        layout, leaves = self.buildTree()
+        layout.draw()
+        layout.addLayer()
+        layout.draw()
+        self.assertEqual(7, layout.redrawCount)
+
+    def testDrawOverrideIsAlwaysRedrawn(self):
+        layout = Layout((200, 100))
+        dynamic = layout.addLayout(CountingLayout())
+        layout.addLayer()
+        layout.draw()
+        layout.draw()
+        self.assertEqual(2, dynamic.drawCount)
+        self.assertEqual(2, layout.redrawCount)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image, ImageDraw
+import pickle
+import threading
+import unittest
+
+from rpi_inky_layout import Layout
+
+
+class TextLayout(Layout):
+
+    def __init__(self, text):
+        super().__init__(border=1)
+        self.text = text
+        self.threads = set()
+
+    def drawOverride(self):
+        self.threads.add(threading.get_ident())
+        self._image = Image.new("RGB", self.size, (255, 255, 255))
+        draw = ImageDraw.Draw(self._image)
+        draw.text((2, 2), self.text, fill=(0, 0, 0))
+
+
+class TestLayoutExecutor(unittest.TestCase):
+
+    @staticmethod
+    def buildTree():
+        layout = Layout((250, 122), border=2)
+        left = layout.addLayer(packingMode='v', border=1)
+        right = layout.addLayer(border=1)
+        leaves = [
+            left.addLayout(TextLayout("a")),
+            left.addLayout(TextLayout("b")),
+            right.addLayout(TextLayout("c")),
+        ]
+        right.addLayer().setImage(Image.new("RGB", (250, 122), (255, 0, 0)))
+        return layout, leaves
+
+    def testThreadPoolMatchesSerial(self):
+        expected, leaves = self.buildTree()
+        layout, leaves = self.buildTree()
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for frame in range(2):
+                self.assertEqual(
+                    expected.draw().tobytes(),
+                    layout.draw(executor=executor).tobytes())
+                self.assertEqual(expected.redrawCount, layout.redrawCount)
+        [
+            self.assertNotIn(threading.get_ident(), leaf.threads)
+            for leaf in leaves
+        ]
+
+    def testProcessPoolMatchesSerial(self):
+        expected, leaves = self.buildTree()
+        layout, leaves = self.buildTree()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            image = layout.draw(executor=executor)
+        self.assertEqual(expected.draw().tobytes(), image.tobytes())
+        self.assertEqual(expected.redrawCount, layout.redrawCount)
+
+    def testPicklingKeepsTheTree(self):
+        layout, leaves = self.buildTree()
+        copied = pickle.loads(pickle.dumps(layout))
+        leaf = copied.children[0].children[1]
+        self.assertIs(copied.children[0], leaf._parent)
+        self.assertIs(copied, copied.children[0]._parent)
+        detached = pickle.loads(pickle.dumps(leaves[0]))
+        self.assertIsNone(detached._parent)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from PIL import Image
+import unittest
+
+from rpi_inky_layout import GeometryCache, Layout, LayoutSpec
+from rpi_inky_layout.geometry import Geometry
+
+
+class TestLayoutGrid(unittest.TestCase):
+
+    @staticmethod
+    def buildGrid(border=2):
+        layout = Layout(
+            (250, 122), packingMode='grid', border=border,
+            rowBias=(1, 1, 2), columnBias=(1, 2, 1, 1))
+        layout.setImage(Image.new("RGB", layout.size, 0xffffff))
+        layout.addLayer(span=(2, 2))
+        layout.addLayer()
+        layout.addLayer(cell=(2, 3))
+        layout.addLayer(span=(1, 2))
+        [
+            child.setImage(Image.new("RGB", child.size, 0x00ff00 + 0x30 * i))
+            for i, child in enumerate(layout.children)
+        ]
+        return layout
+
+    def testCellsAndSpans(self):
+        layout = self.buildGrid()
+        self.assertEqual(
+            [(0, 0), (0, 2), (2, 3), (1, 2)],
+            [child.gridCell for child in layout.children])
+        self.assertEqual(
+            [(2, 2), (150, 2), (200, 64), (150, 33)],
+            [child.topLeft for child in layout.children])
+        self.assertEqual(
+            [(146, 59), (48, 28), (48, 56), (98, 28)],
+            [child.size for child in layout.children])
+
+    def testLeftoverPixelsWidenTheGaps(self):
+        starts, lengths = Geometry.tracks(100, (1, 1, 1), 0)
+        self.assertEqual(([0, 34, 67], [33, 33, 33]), (starts, lengths))
+        starts, lengths = Geometry.tracks(106, (1, 1, 1, 1, 1), 1)
+        self.assertEqual([20] * 5, lengths)
+        # the 2 spare pixels go into the outermost gaps
+        self.assertEqual([0, 22, 43, 64, 86], starts)
+        self.assertEqual(106, starts[-1] + lengths[-1])
+
+    def testGapsArePaintedExceptUnderSpans(self):
+        image = self.buildGrid().draw()
+        red = (2, 0, 0)
+        # between the rows of the spanning child
+        self.assertEqual((0, 0xff, 0), image.getpixel((20, 31)))
+        # between the columns of the spanning child
+        self.assertEqual((0, 0xff, 0), image.getpixel((51, 20)))
+        # between the first two rows, right of the spanning child
+        self.assertEqual(red, image.getpixel((160, 31)))
+        # an empty cell is left alone
+        self.assertEqual((0xff, 0xff, 0xff), image.getpixel((20, 90)))
+        # and the gaps around it are painted
+        self.assertEqual(red, image.getpixel((50, 90)))
+        self.assertEqual(red, image.getpixel((20, 62)))
+
+    def testSharedFramebufferIsTheSame(self):
+        expected = self.buildGrid()
+        layout = self.buildGrid()
+        layout.sharedFramebuffer = True
+        self.assertEqual(expected.draw().tobytes(), layout.draw().tobytes())
+
+    def testResize(self):
+        layout = self.buildGrid()
+        layout.resize((500, 244))
+        self.assertEqual(
+            [(0, 0), (0, 2), (2, 3), (1, 2)],
+            [child.gridCell for child in layout.children])
+        first = layout.children[0]
+        self.assertEqual((2, 2), first.topLeft)
+        self.assertEqual((296, 120), first.size)
+
+    def testBadCells(self):
+        with self.assertRaises(ValueError):
+            Layout(packingMode='grid', rowBias=(1, 1))
+        layout = Layout(packingMode='grid', rowBias=(1,), columnBias=(1, 1))
+        with self.assertRaises(ValueError):
+            layout.addLayer(cell=(0, 1), span=(1, 2))
+        layout.addLayer(span=(1, 2))
+        with self.assertRaises(ValueError):
+            layout.addLayer()
+        with self.assertRaises(ValueError):
+            Layout().addLayer(cell=(0, 0))
+        layout = Layout(
+            packingMode='grid', rowBias=(1, 1, 1), columnBias=(1, 1, 1))
+        layout.addLayer(span=(2, 2))
+        for cell, span in (((0, 0), (1, 1)), ((1, 1), (1, 1)),
+                           ((1, 0), (2, 1))):
+            with self.assertRaises(ValueError):
+                layout.addLayer(cell=cell, span=span)
+        layout.addLayer(cell=(2, 0), span=(1, 3))
+        self.assertEqual(2, len(layout.children))
+
+    def testSpec(self):
+        spec = {
+            "size": [250, 122], "packingMode": "grid", "border": 2,
+            "rowBias": [1, 1, 2], "columnBias": [1, 2, 1, 1],
+            "children": [
+                {"span": [2, 2]}, {}, {"cell": [2, 3]}, {"span": [1, 2]}
+            ]
+        }
+        plan = LayoutSpec.compile(spec)
+        expected = self.buildGrid()
+        self.assertEqual(
+            [child.topLeft for child in expected.children],
+            [child.topLeft for child in plan.children])
+        self.assertEqual(
+            tuple(expected._chromeRects()[4:]), plan.spacerRects)
+        built = LayoutSpec.build(spec, plan)
+        self.assertEqual(
+            [child.gridCell for child in expected.children],
+            [child.gridCell for child in built.children])
+        self.assertEqual(
+            plan, GeometryCache.decode(spec, GeometryCache.encode(spec, plan)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,6 +24,15 @@ class TestLayoutPackingBias(unittest.TestCase):
         self.assertEqual(0, layout._getChildSlotStart(0))
         self.assertEqual(3, layout._getChildSlotStart(1))
 
+    def testTopLeftsFollowSlotsAndSpacers(self):
+        layout = Layout((200, 50), border=2)
+        layout.addLayers([{'packingBias': b} for b in (1, 2, 1, 3)])
+        self.assertEqual(
+            [(27, 46), (54, 46), (27, 46), (81, 46)], layout._slots)
+        self.assertEqual([3, 2, 2], layout._spacers)
+        self.assertEqual(
+            [(2, 2), (32, 2), (88, 2), (117, 2)], layout._topLefts)
+
     def testPackingBiasHorizontal3_1(self):
         layout = Layout((200, 10), packingMode='h', border=(0, 0))
         layout1 = layout.addLayer(packingBias=3)
@@ -0,0 +1,118 @@
+from PIL import Image, ImageDraw
+import os
+import tempfile
+import unittest
+
+from rpi_inky_layout import Layout, Rotation
+
+
+class TestLayoutPalette(unittest.TestCase):
+
+    WHITE = 0
+    BLACK = 1
+    RED = 2
+
+    def buildLayout(self, rotation=Rotation.UP):
+        layout = Layout(
+            (200, 100), border=1, imageMode="P", rotation=rotation)
+        left = layout.addLayer()
+        right = layout.addLayer(packingMode='v')
+        right.addLayer()
+        right.addLayer()
+        img = Image.new("P", left.size, self.RED)
+        img.putpalette(Layout.DEFAULT_PALETTE)
+        ImageDraw.Draw(img).text((2, 2), "left", fill=self.BLACK)
+        left.setImage(img)
+        return layout
+
+    def testChildrenInheritModeAndPalette(self):
+        layout = self.buildLayout()
+        [
+            self.assertEqual(("P", Layout.DEFAULT_PALETTE), (
+                child.imageMode, child.palette))
+            for child in layout.children + layout.children[1].children
+        ]
+
+    def testDrawsInPaletteMode(self):
+        layout = self.buildLayout()
+        image = layout.draw()
+        self.assertEqual("P", image.mode)
+        self.assertEqual(
+            list(Layout.DEFAULT_PALETTE[:9]), image.getpalette()[:9])
+        # the border is drawn with the palette index
+        self.assertEqual(self.RED, image.getpixel((0, 0)))
+        # and so are the spacers
+        right = layout.children[1]
+        self.assertEqual(
+            self.RED, image.getpixel((right.topLeft[0] - 1, 50)))
+        # default images are filled with their depth as the palette index
+        first = right.children[0]
+        self.assertEqual(first._depth, image.getpixel((
+            right.topLeft[0] + first.topLeft[0] + 5,
+            right.topLeft[1] + first.topLeft[1] + 5)))
+
+    def testRotatedPaletteImage(self):
+        image = self.buildLayout(Rotation.RIGHT).draw()
+        self.assertEqual("P", image.mode)
+        self.assertEqual((200, 100), image.size)
+
+    def testSetImageMatchesPalette(self):
+        layout = Layout((30, 10), imageMode="P")
+        img = Image.new("RGB", layout.size, (250, 5, 5))
+        img.paste((0, 0, 0), (10, 0, 20, 10))
+        img.paste((255, 255, 255), (20, 0, 30, 10))
+        layout.setImage(img)
+        self.assertEqual("P", layout._image.mode)
+        self.assertEqual(
+            [self.RED, self.BLACK, self.WHITE],
+            [layout._image.getpixel((x, 5)) for x in (5, 15, 25)])
+
+    def testAddedLayoutsAreMatchedToThePalette(self):
+        for shared in (False, True):
+            layout = Layout((40, 20), border=1, imageMode="P")
+            layout.sharedFramebuffer = shared
+            red = layout.addLayout(Layout())
+            red.setImage(Image.new("RGB", red.size, (0xff, 0, 0)))
+            self.assertEqual("RGB", red._image.mode)
+            # a "P" image with another palette is matched by its colours
+            black = layout.addLayout(
+                Layout(imageMode="P", palette=(0, 0, 0) * 256))
+            black.setImage(Image.new("P", black.size, 5))
+            image = layout.draw()
+            self.assertEqual(self.RED, image.getpixel((10, 10)), shared)
+            self.assertEqual(self.BLACK, image.getpixel((30, 10)), shared)
+            blackWhite, colour = layout.toPanelBuffer()
+            # the red child, and the (red) border and spacer around it
+            self.assertEqual(
+                bytes([0xff, 0xff, 0xf8, 0, 0x01]), colour[10 * 5:11 * 5],
+                shared)
+
+    def testRGBLayoutKeepsImageMode(self):
+        layout = Layout((30, 10))
+        layout.setImage(Image.new("L", layout.size, 7))
+        self.assertEqual("L", layout._image.mode)
+
+    def testWriteWithoutConversion(self):
+        layout = self.buildLayout()
+        expected = layout.draw()
+        with tempfile.TemporaryDirectory() as directory:
+            fp = os.path.join(directory, "palette.png")
+            layout.write(fp, mode=None)
+            with Image.open(fp) as written:
+                self.assertEqual("P", written.mode)
+                self.assertEqual(expected.tobytes(), written.tobytes())
+            with Image.open(os.path.join(directory, "palette-1.png")) as w:
+                self.assertEqual("P", w.mode)
+
+    def testWriteConvertsToRGBByDefault(self):
+        layout = self.buildLayout()
+        with tempfile.TemporaryDirectory() as directory:
+            fp = os.path.join(directory, "rgb.png")
+            layout.write(fp)
+            with Image.open(fp) as written:
+                self.assertEqual("RGB", written.mode)
+                self.assertEqual((255, 0, 0), written.getpixel((0, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from PIL import Image, ImageDraw
+import unittest
+
+from rpi_inky_layout import Layout, Rotation
+
+
+class TestLayoutPanelBuffer(unittest.TestCase):
+
+    @staticmethod
+    def unpack(plane, size):
+        """Reference unpacker: one bit per pixel, MSB first, row by row."""
+        w, h = size
+        bits = []
+        for byte in plane:
+            bits += [(byte >> (7 - bit)) & 1 for bit in range(8)]
+        return [bits[y * w:(y + 1) * w] for y in range(h)]
+
+    def buildLayout(self, imageMode="P", rotation=Rotation.UP):
+        layout = Layout(
+            (61, 13), border=1, imageMode=imageMode, rotation=rotation)
+        left = layout.addLayer()
+        right = layout.addLayer()
+        img = Image.new("RGB", left.size, (255, 255, 255))
+        ImageDraw.Draw(img).line((0, 0) + left.size, fill=(0, 0, 0))
+        left.setImage(img)
+        right.setImage(Image.new("RGB", right.size, (0, 0, 0)))
+        return layout
+
+    def assertPlanesMatch(self, layout):
+        image = layout.draw()
+        if image.mode != "P":
+            image = layout._toPalette(image)
+        blackWhite, colour = layout.toPanelBuffer()
+        w, h = image.size
+        self.assertEqual((w * h + 7) // 8, len(blackWhite))
+        self.assertEqual((w * h + 7) // 8, len(colour))
+        bw = self.unpack(blackWhite, image.size)
+        c = self.unpack(colour, image.size)
+        for y in range(h):
+            for x in range(w):
+                pixel = image.getpixel((x, y))
+                self.assertEqual(int(pixel != Layout.BLACK), bw[y][x])
+                self.assertEqual(int(pixel == Layout.RED), c[y][x])
+
+    def testPaletteLayout(self):
+        self.assertPlanesMatch(self.buildLayout())
+
+    def testRGBLayout(self):
+        self.assertPlanesMatch(self.buildLayout(imageMode="RGB"))
+
+    def testRotatedLayout(self):
+        self.assertPlanesMatch(self.buildLayout(rotation=Rotation.LEFT))
+
+    def testKnownValues(self):
+        layout = Layout((8, 2), imageMode="P")
+        img = Image.new("P", (8, 2), Layout.WHITE)
+        img.putpixel((0, 0), Layout.BLACK)
+        img.putpixel((7, 1), Layout.RED)
+        layout.setImage(img)
+        self.assertEqual(
+            (bytes([0x7f, 0xff]), bytes([0x00, 0x01])),
+            layout.toPanelBuffer())
+
+    def testIndicesPastRedMatchTheirColour(self):
+        palette = list(Layout.DEFAULT_PALETTE)
+        palette[12:18] = [250, 10, 10, 240, 240, 240]
+        layout = Layout((8, 1), imageMode="P", palette=palette)
+        img = Image.new("P", (8, 1), Layout.WHITE)
+        # 3 is black in the palette, 4 nearly red, 5 nearly white
+        [img.putpixel((x, 0), x - 2) for x in (5, 6, 7)]
+        layout.setImage(img)
+        self.assertEqual(
+            (bytes([0xfb]), bytes([0x02])), layout.toPanelBuffer())
+
+    def testDefaultImagesOfDeepLayoutsAreBlack(self):
+        layout = Layout((8, 1), imageMode="P")
+        deepest = layout.addLayer().addLayer().addLayer()
+        self.assertEqual(3, deepest._depth)
+        self.assertEqual(
+            (bytes([0x00]), bytes([0x00])), layout.toPanelBuffer())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -82,6 +82,24 @@ class TestLayoutRotation(unittest.TestCase):
             "test-rotated-{rot}-add-3-layers.png".format(rot=rotation.name)
         )
 
+    def testDrawUpReturnsOwnImage(self):
+        layout = Layout((200, 100), rotation=Rotation.UP)
+        image = layout.draw()
+        self.assertIs(layout._image, image)
+
+    def testTransposeMatchesRotate(self):
+        for rotation in Rotation:
+            layout = Layout((200, 100), border=2, rotation=rotation)
+            img = Image.new("RGB", layout.size, 0xffffff)
+            self.drawTextOnImage(rotation.name, img)
+            layout.addLayer().setImage(img)
+            layout.addLayer()
+            image = layout.draw()
+            self.assertEqual(
+                layout._image.rotate(
+                    -layout.rotation_degrees, expand=1).tobytes(),
+                image.tobytes(), rotation)
+
     def drawTextOnImage(self, text, img):
         draw = ImageDraw.Draw(img)
         tsize = draw.textsize(text)
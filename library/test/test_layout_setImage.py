@@ -0,0 +1,99 @@
+from PIL import Image, ImageDraw
+import unittest
+
+from rpi_inky_layout import Layout
+
+
+class TestLayoutSetImage(unittest.TestCase):
+
+    @staticmethod
+    def drawImage(size, text):
+        img = Image.new("RGB", size, 0xffffff)
+        ImageDraw.Draw(img).text((2, 2), text, fill=0)
+        return img
+
+    def buildTree(self):
+        layout = Layout((200, 100), border=1)
+        leaves = [layout.addLayer(), layout.addLayer()]
+        [
+            leaf.setImage(self.drawImage(leaf.size, "leaf"), True)
+            for leaf in leaves
+        ]
+        layout.draw()
+        return layout, leaves
+
+    def testUnchangedImageIsSkipped(self):
+        layout, leaves = self.buildTree()
+        image = leaves[0]._image
+        returned = leaves[0].setImage(
+            self.drawImage(leaves[0].size, "leaf"), skipUnchanged=True)
+        self.assertIs(image, returned)
+        self.assertFalse(leaves[0]._dirty)
+        layout.draw()
+        self.assertEqual(0, layout.redrawCount)
+        self.assertEqual([], layout.damage())
+
+    def testChangedImageIsSet(self):
+        layout, leaves = self.buildTree()
+        leaves[1].setImage(
+            self.drawImage(leaves[1].size, "changed"), skipUnchanged=True)
+        layout.draw()
+        self.assertEqual(2, layout.redrawCount)
+
+    def testWithoutSkippingAlwaysRedraws(self):
+        layout, leaves = self.buildTree()
+        leaves[0].setImage(self.drawImage(leaves[0].size, "leaf"))
+        layout.draw()
+        self.assertEqual(2, layout.redrawCount)
+
+    def testNotSkippedAfterResizeOrMarkDirty(self):
+        layout, leaves = self.buildTree()
+        leaf = leaves[0]
+        size = leaf.size
+        layout.resize((300, 100))
+        layout.draw()
+        # the same image as before, but the layout has been resized
+        leaf.setImage(self.drawImage(size, "leaf"), skipUnchanged=True)
+        self.assertEqual(leaf.size, leaf._image.size)
+        self.assertTrue(leaf._dirty)
+        layout.draw()
+        leaf.markDirty()
+        self.assertIsNone(leaf._imageHash)
+
+    def testPaletteIsPartOfTheContent(self):
+        layout = Layout((20, 10))
+        img = Image.new("P", layout.size, 1)
+        img.putpalette(Layout.DEFAULT_PALETTE)
+        layout.setImage(img, skipUnchanged=True)
+        layout.draw()
+        img = img.copy()
+        img.putpalette((0, 0, 255) * 256)
+        layout.setImage(img, skipUnchanged=True)
+        self.assertTrue(layout._dirty)
+
+    def testRightSizedImageIsNotCopied(self):
+        layout, leaves = self.buildTree()
+        image = self.drawImage(leaves[0].size, "adopted")
+        self.assertIs(image, leaves[0].setImage(image, copy=False))
+        layout.draw()
+        self.assertIs(image, leaves[0]._image)
+        layout.resize(layout.size)
+        self.assertIs(image, leaves[0]._image)
+
+    def testLargerImageIsCroppedWhenDrawn(self):
+        for shared in (False, True):
+            expected, leaves = self.buildTree()
+            expected.sharedFramebuffer = shared
+            big = self.drawImage((300, 200), "big")
+            leaves[1].setImage(big)
+            layout, leaves = self.buildTree()
+            layout.sharedFramebuffer = shared
+            leaves[1].setImage(big.copy(), copy=False)
+            self.assertEqual((300, 200), leaves[1]._image.size)
+            self.assertEqual(
+                expected.draw().tobytes(), layout.draw().tobytes())
+            self.assertEqual(leaves[1].size, leaves[1]._image.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+from PIL import Image, ImageDraw
+import unittest
+
+from rpi_inky_layout import Layout, Rotation
+
+
+class TestLayoutSharedFramebuffer(unittest.TestCase):
+
+    @staticmethod
+    def setImage(layout, colour, text):
+        img = Image.new("RGB", layout.size, colour)
+        draw = ImageDraw.Draw(img)
+        draw.text((1, 1), text, fill=(0, 0, 0))
+        layout.setImage(img)
+
+    def buildTree(self, rotation=Rotation.UP, packingMode='h', border=1):
+        layout = Layout(
+            (250, 122), packingMode=packingMode, border=border,
+            rotation=rotation
+        )
+        self.setImage(layout, 0x000000, "")
+        leaves = []
+        for i in range(3):
+            child = layout.addLayer(
+                packingBias=i + 1, border=border,
+                packingMode='v' if i % 2 else 'h'
+            )
+            if i == 1:
+                self.setImage(child, 0xffffff, "")
+                leaves += [child.addLayer(border=1) for j in range(2)]
+            else:
+                leaves.append(child)
+        [
+            self.setImage(leaf, 0x203040 * (i + 1), "leaf%d" % i)
+            for i, leaf in enumerate(leaves)
+        ]
+        return layout, leaves
+
+    def testSameImageAsClassicCompositing(self):
+        for rotation in Rotation:
+            for packingMode in ('h', 'v'):
+                for border in (0, 1, 3):
+                    expected, leaves = self.buildTree(
+                        rotation, packingMode, border)
+                    layout, leaves = self.buildTree(
+                        rotation, packingMode, border)
+                    layout.sharedFramebuffer = True
+                    self.assertEqual(
+                        expected.draw().tobytes(), layout.draw().tobytes(),
+                        (rotation, packingMode, border)
+                    )
+
+    def testNoImagesOnLayoutsWithChildren(self):
+        layout = Layout((200, 100))
+        layout.addLayer().addLayer()
+        layout.addLayer()
+        layout.sharedFramebuffer = True
+        layout.draw()
+        self.assertIsNone(layout._image)
+        self.assertIsNone(layout.children[0]._image)
+
+    def testIncrementalRedraw(self):
+        layout, leaves = self.buildTree()
+        layout.sharedFramebuffer = True
+        layout.draw()
+        self.assertEqual(6, layout.redrawCount)
+        self.setImage(leaves[2], 0xff0000, "changed")
+        image = layout.draw()
+        self.assertEqual(3, layout.redrawCount)
+
+        expected, expectedLeaves = self.buildTree()
+        self.setImage(expectedLeaves[2], 0xff0000, "changed")
+        self.assertEqual(expected.draw().tobytes(), image.tobytes())
+
+        parent = layout.children[1]
+        x = parent.topLeft[0] + leaves[2].topLeft[0]
+        y = parent.topLeft[1] + leaves[2].topLeft[1]
+        self.assertEqual(
+            [(x, y, x + leaves[2].size[0], y + leaves[2].size[1])],
+            layout.damage()
+        )
+
+    def testPaddingSpacersStayInsideTheirLayout(self):
+        def buildPadded(packingMode, size):
+            layout = Layout(size, packingMode=packingMode)
+            layout.sharedFramebuffer = True
+            top = layout.addLayer()
+            bottom = layout.addLayer()
+            # uneven slots are evened out with padding spacers
+            top.addLayers([{}, {'packingBias': 2}, {}, {}])
+            bottom.setImage(Image.new("RGB", bottom.size, 0x00ff00))
+            return layout, top
+
+        for packingMode, size in (('v', (32, 20)), ('h', (20, 32))):
+            layout, top = buildPadded(packingMode, size)
+            layout.draw()
+            # redraws top, and its spacers, over the same children
+            top.setImage(Image.new("RGB", top.size, 0xff))
+            image = layout.draw()
+            expected, expectedTop = buildPadded(packingMode, size)
+            expectedTop.setImage(Image.new("RGB", top.size, 0xff))
+            self.assertEqual(
+                expected.draw().tobytes(), image.tobytes(), packingMode)
+            self.assertEqual(
+                [(0, 0) + top.size], layout.damage(), packingMode)
+
+    def testNothingChanged(self):
+        layout, leaves = self.buildTree()
+        layout.sharedFramebuffer = True
+        layout.draw()
+        layout.draw()
+        self.assertEqual(0, layout.redrawCount)
+        self.assertEqual([], layout.damage())
+
+
+if __name__ == '__main__':
+    unittest.main()
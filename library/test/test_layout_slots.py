@@ -0,0 +1,54 @@
+import numpy
+import pickle
+import unittest
+
+from rpi_inky_layout import Layout
+
+
+class TestLayoutSlots(unittest.TestCase):
+
+    class LayoutSub(Layout):
+
+        def __init__(self):
+            super().__init__((200, 200))
+            self.text = "sub"
+
+    def buildTree(self):
+        layout = Layout((250, 122), border=1)
+        layout.addLayers([{'packingBias': bias} for bias in (1, 2, 3)])
+        layout.addLayout(self.LayoutSub())
+        return layout
+
+    def testNoInstanceDict(self):
+        layout = Layout()
+        self.assertFalse(hasattr(layout, '__dict__'))
+        with self.assertRaises(AttributeError):
+            layout.notAnAttribute = 1
+
+    def testSubclassesKeepTheirDict(self):
+        self.assertEqual("sub", self.LayoutSub().text)
+
+    def testGeometryIsOneArray(self):
+        layout = self.buildTree()
+        self.assertEqual((4, 4), layout._rects.shape)
+        self.assertEqual(numpy.int32, layout._rects.dtype)
+        self.assertEqual(
+            [child.topLeft + child.size for child in layout.children],
+            [tuple(rect) for rect in layout._rects.tolist()])
+        self.assertEqual(
+            [child.size for child in layout.children], layout._slots)
+        self.assertEqual(
+            [child.topLeft for child in layout.children], layout._topLefts)
+
+    def testPickle(self):
+        layout = self.buildTree()
+        copy = pickle.loads(pickle.dumps(layout))
+        self.assertEqual(layout._topLefts, copy._topLefts)
+        self.assertEqual(layout.borders, copy.borders)
+        self.assertIs(copy, copy.children[0]._parent)
+        self.assertEqual("sub", copy.children[3].text)
+        self.assertEqual(layout.draw().tobytes(), copy.draw().tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
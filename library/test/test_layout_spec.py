@@ -0,0 +1,134 @@
+import json
+import unittest
+
+from rpi_inky_layout import Layout, LayoutSpec, Rotation
+
+
+class TestLayoutSpec(unittest.TestCase):
+
+    SPEC = {
+        "size": [250, 122],
+        "border": 1,
+        "children": [
+            {"name": "left", "packingBias": 2, "border": 2},
+            {
+                "name": "right", "packingMode": "v", "border": [[1, 3], 1],
+                "children": [
+                    {"name": "top", "packingBias": 3},
+                    {"name": "middle", "rotation": "LEFT"},
+                    {
+                        "name": "bottom", "border": 1,
+                        "children": [{}, {"packingBias": 2}, {}]
+                    }
+                ]
+            },
+            {"name": "thin", "border": 1}
+        ]
+    }
+
+    @staticmethod
+    def buildIncrementally(spec, layout=None):
+        """Build the spec one addLayer at a time, the usual way."""
+        if layout is None:
+            border = spec.get('border', (0, 0))
+            layout = Layout(
+                size=tuple(spec['size']),
+                packingMode=spec.get('packingMode', 'h'),
+                border=tuple(border) if isinstance(border, list) else border,
+                rotation=Rotation[spec.get('rotation', 'UP')])
+        for child in spec.get('children', []):
+            border = child.get('border', 0)
+            if isinstance(border, list):
+                border = (tuple(border[0]), border[1])
+            TestLayoutSpec.buildIncrementally(child, layout.addLayer(
+                packingMode=child.get('packingMode', 'h'),
+                packingBias=child.get('packingBias', 1),
+                border=border,
+                rotation=Rotation[child.get('rotation', 'UP')]))
+        return layout
+
+    def assertSameGeometry(self, plan, layout, origin=(0, 0)):
+        self.assertEqual(tuple(plan.size), tuple(layout.size))
+        self.assertEqual(tuple(plan.topLeft), tuple(layout.topLeft))
+        self.assertEqual(
+            origin + (origin[0] + layout.size[0], origin[1] + layout.size[1]),
+            plan.rect)
+        self.assertEqual(plan.borders, layout.borders)
+        if layout.children:
+            self.assertEqual(list(plan.packing.spacers), layout._spacers)
+            self.assertEqual(list(plan.packing.slots), layout._slots)
+            self.assertEqual(list(plan.packing.topLefts), layout._topLefts)
+        [
+            self.assertSameGeometry(childPlan, child, (
+                origin[0] + child.topLeft[0], origin[1] + child.topLeft[1]))
+            for childPlan, child in zip(plan.children, layout.children)
+        ]
+
+    def testCompileMatchesIncrementalLayout(self):
+        for rotation in Rotation:
+            for packingMode in ('h', 'v'):
+                spec = dict(
+                    self.SPEC, rotation=rotation.name, packingMode=packingMode)
+                self.assertSameGeometry(
+                    LayoutSpec.compile(spec), self.buildIncrementally(spec))
+
+    def testCompileFromJson(self):
+        plan = LayoutSpec.compile(json.loads(json.dumps(self.SPEC)))
+        right = plan.children[1]
+        self.assertEqual("right", right.name)
+        self.assertEqual((1, 3, 1, 3), right.borders)
+        self.assertEqual(1, right.borderColour)
+        self.assertEqual(Rotation.LEFT, right.children[1].rotation)
+
+    def testPlanIsImmutable(self):
+        plan = LayoutSpec.compile(self.SPEC)
+        with self.assertRaises(AttributeError):
+            plan.size = (1, 1)
+        self.assertIsInstance(plan.children, tuple)
+        self.assertIsInstance(plan.packing.topLefts, tuple)
+
+    def testSpacerRectsAreAbsolute(self):
+        plan = LayoutSpec.compile(self.SPEC)
+        layout = self.buildIncrementally(self.SPEC)
+        bottom = layout.children[1].children[2]
+        x = layout.children[1].topLeft[0] + bottom.topLeft[0]
+        y = layout.children[1].topLeft[1] + bottom.topLeft[1]
+        self.assertEqual(
+            [
+                (x0 + x, y0 + y, x1 + x, y1 + y)
+                for x0, y0, x1, y1 in bottom._chromeRects()[4:]
+            ],
+            list(plan.children[1].children[2].spacerRects))
+
+    def testBuildDrawsTheSame(self):
+        for rotation in Rotation:
+            spec = dict(self.SPEC, rotation=rotation.name)
+            built = LayoutSpec.build(spec)
+            expected = self.buildIncrementally(spec)
+            self.assertSameGeometry(LayoutSpec.compile(spec), built)
+            self.assertEqual(
+                expected.draw().tobytes(), built.draw().tobytes(), rotation)
+
+    def testApplyToExistingTree(self):
+        layout = self.buildIncrementally(self.SPEC)
+        plan = LayoutSpec.compile(dict(self.SPEC, size=[400, 300]))
+        LayoutSpec.apply(plan, layout)
+        self.assertSameGeometry(plan, layout)
+        self.assertSameGeometry(plan, self.buildIncrementally(
+            dict(self.SPEC, size=[400, 300])))
+
+    def testApplyToDifferentTree(self):
+        layout = Layout((250, 122))
+        layout.addLayer()
+        with self.assertRaises(ValueError):
+            LayoutSpec.apply(LayoutSpec.compile(self.SPEC), layout)
+
+    def testBadSpecs(self):
+        with self.assertRaises(ValueError):
+            LayoutSpec.compile({"size": [10, 10], "colour": 1})
+        with self.assertRaises(ValueError):
+            LayoutSpec.compile({"children": [{"size": [10, 10]}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
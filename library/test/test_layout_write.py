@@ -0,0 +1,85 @@
+from PIL import Image
+import os
+import tempfile
+import unittest
+
+from rpi_inky_layout import Layout, Rotation
+
+
+class CountingLayout(Layout):
+
+    def __init__(self):
+        super().__init__()
+        self.drawCount = 0
+
+    def drawOverride(self):
+        self.drawCount += 1
+        self._image = Image.new("RGB", self.size, (0, 0, 255))
+
+
+class TestLayoutWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(suffix=".d")
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def buildTree(self):
+        layout = Layout((200, 100), border=1)
+        left = layout.addLayer(packingMode='v', rotation=Rotation.DOWN)
+        self.dynamic = left.addLayout(CountingLayout())
+        left.addLayer().setImage(Image.new("RGB", (200, 100), (0, 255, 0)))
+        layout.addLayer().setImage(Image.new("RGB", (200, 100), (255, 0, 0)))
+        return layout
+
+    def written(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def testWritesEveryDescendant(self):
+        self.buildTree().write(self.path("tree.png"))
+        self.assertEqual([
+            "tree-0-0.png", "tree-0-1.png", "tree-0.png", "tree-1.png",
+            "tree.png"
+        ], self.written())
+
+    def testDrawsOnce(self):
+        self.buildTree().write(self.path("tree.png"))
+        self.assertEqual(1, self.dynamic.drawCount)
+
+    def testDepths(self):
+        layout = self.buildTree()
+        layout.write(self.path("tree.png"), depths=())
+        self.assertEqual(["tree.png"], self.written())
+        layout.write(self.path("depth.png"), depths=[2])
+        self.assertEqual(
+            ["depth-0-0.png", "depth-0-1.png", "depth.png", "tree.png"],
+            self.written())
+
+    def testDottedPaths(self):
+        self.assertTrue(self.directory.name.endswith(".d"))
+        self.buildTree().write(self.path("tree.v1.png"), depths=[1])
+        self.assertEqual(
+            ["tree.v1-0.png", "tree.v1-1.png", "tree.v1.png"],
+            self.written())
+
+    def testChildImagesMatchDraw(self):
+        for shared in (False, True):
+            layout = self.buildTree()
+            layout.sharedFramebuffer = shared
+            layout.write(self.path("tree.png"))
+            left = layout.children[0]
+            expected = Layout._rotate(left, layout.draw().crop(
+                left.topLeft + (
+                    left.topLeft[0] + left.size[0],
+                    left.topLeft[1] + left.size[1])))
+            with Image.open(self.path("tree-0.png")) as written:
+                self.assertEqual(expected.tobytes(), written.tobytes())
+            expected = left.children[1]._image
+            with Image.open(self.path("tree-0-1.png")) as written:
+                self.assertEqual(expected.tobytes(), written.tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+from PIL import Image
+import os
+import tempfile
+import unittest
+
+from rpi_inky_layout import Layout, RenderStats
+
+
+class TickingClock:
+    """A fake clock that moves on by a second every time it's read."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class SubLayout(Layout):
+
+    def drawOverride(self):
+        self._image = Image.new("RGB", self.size, (0, 0, 0))
+
+
+class TestRenderStats(unittest.TestCase):
+
+    def buildTree(self, stats):
+        layout = Layout((200, 100), border=1)
+        layout.setStats(stats)
+        left = layout.addLayer(packingMode='v')
+        self.sub = left.addLayout(SubLayout())
+        left.addLayer()
+        layout.addLayer()
+        return layout
+
+    def testRecordsEveryPhase(self):
+        stats = RenderStats(clock=TickingClock())
+        layout = self.buildTree(stats)
+        layout.draw()
+        with tempfile.TemporaryDirectory() as directory:
+            layout.write(os.path.join(directory, "stats.png"), depths=())
+        phases = set([row[2] for row in stats.summary()])
+        self.assertEqual(set(RenderStats.PHASES), phases)
+        # each timing is one tick of the clock
+        self.assertEqual(
+            sum([row[3] for row in stats.summary()]), stats.total())
+
+    def testStatsFollowAddedLayouts(self):
+        stats = RenderStats()
+        layout = self.buildTree(stats)
+        self.assertIs(stats, self.sub._stats)
+        layout.setStats(None)
+        self.assertIsNone(self.sub._stats)
+
+    def testSummaryHasIdAndDepth(self):
+        stats = RenderStats(clock=TickingClock())
+        layout = self.buildTree(stats)
+        stats.reset()
+        layout.draw()
+        rows = [row for row in stats.summary() if row[2] == 'drawOverride']
+        self.assertIn((self.sub._id, self.sub._depth, 'drawOverride', 1, 1.0),
+                      rows)
+
+    def testFolded(self):
+        stats = RenderStats(clock=TickingClock())
+        layout = self.buildTree(stats)
+        stats.reset()
+        layout.draw()
+        lines = stats.folded().splitlines()
+        expected = "{root};{left};{sub};drawOverride 1000000".format(
+            root=RenderStats.frameName(layout),
+            left=RenderStats.frameName(layout.children[0]),
+            sub=RenderStats.frameName(self.sub))
+        self.assertIn(expected, lines)
+        self.assertTrue(all([
+            line.rsplit(" ", 1)[1].isdigit() for line in lines
+        ]))
+        self.assertEqual("", RenderStats().folded())
+
+    def testNoStatsNoRecords(self):
+        layout = self.buildTree(None)
+        layout.draw()
+        self.assertIsNone(layout._stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
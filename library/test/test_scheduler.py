@@ -0,0 +1,109 @@
+import asyncio
+from PIL import Image
+import unittest
+
+from rpi_inky_layout import Layout, RefreshScheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.layout = Layout((100, 50), border=1)
+        self.leaves = [self.layout.addLayer(), self.layout.addLayer()]
+        self.layout.draw()
+        self.frames = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    def sink(self, image, damage):
+        self.frames.append((image, damage))
+
+    def producer(self, colours, scheduler, stopAfter=None):
+        calls = []
+
+        async def produce(layout):
+            calls.append(layout)
+            if stopAfter is not None and len(calls) >= stopAfter:
+                scheduler.stop()
+            return Image.new("RGB", layout.size, colours[len(calls) - 1])
+        return produce
+
+    def testUpdatesInTheDebounceWindowAreCoalesced(self):
+        scheduler = RefreshScheduler(self.layout, self.sink, debounce=0.05)
+        scheduler.register(
+            self.leaves[0],
+            self.producer([(0xff, 0, 0)] * 9, scheduler, 2), 0.2)
+        scheduler.register(
+            self.leaves[1], self.producer([(0, 0xff, 0)] * 9, scheduler), 0.2)
+        self.loop.run_until_complete(scheduler.run())
+        # both first updates in one frame; the second updates are unchanged
+        self.assertEqual(1, len(self.frames))
+        self.assertEqual(1, scheduler.refreshCount)
+        image, damage = self.frames[0]
+        self.assertEqual((0xff, 0, 0), image.getpixel((10, 10)))
+        self.assertEqual((0, 0xff, 0), image.getpixel((90, 10)))
+        self.assertEqual([(1, 1, 49, 49), (51, 1, 99, 49)], damage)
+
+    def testChangesAreSentAndPendingUpdatesFlushedOnStop(self):
+        colours = [(0, 0, 0xff), (0, 0xff, 0xff), (0xff, 0xff, 0xff)]
+        scheduler = RefreshScheduler(self.layout, self.sink, debounce=0.05)
+        scheduler.register(
+            self.leaves[1], self.producer(colours, scheduler, 3), 0.1)
+        self.loop.run_until_complete(scheduler.run())
+        self.assertEqual(3, len(self.frames))
+        self.assertEqual(
+            colours,
+            [image.getpixel((90, 10)) for image, damage in self.frames])
+
+    def testAsyncSinkAndNoneForDrawOverride(self):
+        sent = []
+
+        async def sink(image, damage):
+            sent.append(damage)
+
+        async def produce(layout):
+            scheduler.stop()
+        scheduler = RefreshScheduler(self.layout, sink, debounce=10)
+        scheduler.register(self.leaves[0], produce, 1)
+        self.loop.run_until_complete(scheduler.run())
+        self.assertEqual(1, len(sent))
+
+    def testRefreshesInFlightFinishBeforeRunReturns(self):
+        events = []
+
+        async def sink(image, damage):
+            events.append("sending")
+            await asyncio.sleep(0.1)
+            events.append("sent")
+
+        scheduler = RefreshScheduler(self.layout, sink, debounce=0.01)
+        # the second call stops the scheduler while the sink is sending
+        scheduler.register(
+            self.leaves[0],
+            self.producer([(0xff, 0, 0)] * 2, scheduler, 2), 0.05)
+        self.loop.run_until_complete(scheduler.run())
+        self.assertEqual(["sending", "sent"], events)
+
+    def testErrorsStopTheScheduler(self):
+        async def produce(layout):
+            raise RuntimeError("no weather")
+        scheduler = RefreshScheduler(self.layout, self.sink)
+        scheduler.register(self.leaves[0], produce, 1)
+        with self.assertRaises(RuntimeError):
+            self.loop.run_until_complete(scheduler.run())
+
+        def sink(image, damage):
+            raise OSError("no panel")
+        scheduler = RefreshScheduler(self.layout, sink, debounce=0)
+        scheduler.register(
+            self.leaves[0], self.producer([0, 0xffffff] * 9, scheduler), 1)
+        with self.assertRaises(OSError):
+            self.loop.run_until_complete(scheduler.run())
+        with self.assertRaises(ValueError):
+            scheduler.register(self.leaves[0], produce, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+from PIL import Image, ImageDraw, ImageFont
+import unittest
+
+from rpi_inky_layout import Layout, Position, TextCache
+
+
+class TestTextCache(unittest.TestCase):
+
+    FONT = ImageFont.load_default()
+
+    def testSameAsImageDraw(self):
+        cache = TextCache()
+        for mode, background, fill in (
+            ("RGB", (0xff, 0xff, 0xff), (0xff, 0, 0)),
+            ("P", Layout.WHITE, Layout.BLACK),
+        ):
+            expected = Image.new(mode, (100, 30), background)
+            ImageDraw.Draw(expected).text(
+                (5, 7), "Hello 12:34", fill=fill, font=self.FONT)
+            image = Image.new(mode, (100, 30), background)
+            box = cache.draw(image, (5, 7), "Hello 12:34", self.FONT, fill)
+            self.assertEqual(expected.tobytes(), image.tobytes())
+            self.assertEqual((5, 7, 71, 18), box)
+
+    def testGlyphsOnlyRasteriseNewCharacters(self):
+        cache = TextCache()
+        image = Image.new("L", (60, 20), 0xff)
+        cache.draw(image, (0, 0), "12:34", self.FONT, 0, glyphs=True)
+        self.assertEqual(5, cache.misses)
+        expected = Image.new("L", (60, 20), 0xff)
+        ImageDraw.Draw(expected).text((0, 0), "12:35", fill=0, font=self.FONT)
+        image = Image.new("L", (60, 20), 0xff)
+        cache.draw(image, (0, 0), "12:35", self.FONT, 0, glyphs=True)
+        self.assertEqual(6, cache.misses)
+        self.assertEqual(4, cache.hits)
+        self.assertEqual(expected.tobytes(), image.tobytes())
+
+    def testLeastRecentlyUsedRunsAreEvicted(self):
+        cache = TextCache(maxEntries=2)
+        [cache.run(text, self.FONT) for text in ("a", "b", "a", "c")]
+        self.assertEqual(2, len(cache))
+        cache.run("a", self.FONT)
+        self.assertEqual(3, cache.misses)
+        cache.run("b", self.FONT)
+        self.assertEqual(4, cache.misses)
+
+        run = cache.run("memory", self.FONT)
+        runBytes = run.mask.size[0] * run.mask.size[1]
+        cache = TextCache(maxBytes=runBytes * 2)
+        [cache.run(text, self.FONT) for text in ("abcdef", "ghijkl", "mnopqr")]
+        self.assertEqual(2, len(cache))
+        self.assertEqual(runBytes * 2, cache.byteCount)
+        cache.clear()
+        self.assertEqual((0, 0), (len(cache), cache.byteCount))
+
+    def testDrawAtPositionMarksTheLayoutDirty(self):
+        layout = Layout((100, 40))
+        layout.setImage(Image.new("RGB", layout.size, (0xff, 0xff, 0xff)))
+        layout.draw()
+        box = TextCache().drawAt(
+            layout._image, "12:34", self.FONT, (0, 0, 0),
+            position=Position.bottom_right)
+        self.assertEqual((70, 29, 100, 40), box)
+        layout.markDirty(box)
+        layout.draw()
+        self.assertEqual([box], layout.damage())
+        self.assertEqual(
+            (0, 0, 30, 11), TextCache().measure("12:34", self.FONT))
+
+
+if __name__ == '__main__':
+    unittest.main()